@@ -1,18 +1,22 @@
 from django_filters.rest_framework import (
-    ModelMultipleChoiceFilter, FilterSet, BooleanFilter
+    ModelMultipleChoiceFilter, FilterSet, BooleanFilter, CharFilter
 )
-from rest_framework.filters import SearchFilter
 
 from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
+from recipes.tag_masks import filter_by_tags
 
 
 class RecipeFilter(FilterSet):
     tags = ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
-        queryset=Tag.objects.all()
+        queryset=Tag.objects.all(),
+        method='filter_by_tags'
     )
 
+    search = CharFilter(method='filter_by_search', label='Search')
+
     is_favorited = BooleanFilter(
         method='filter_by_is_favorited', label='Favorite'
     )
@@ -23,7 +27,16 @@ class RecipeFilter(FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'tags', 'search', 'is_favorited',
+                  'is_in_shopping_cart')
+
+    def filter_by_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return filter_by_tags(queryset, value)
+
+    def filter_by_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
 
     def filter_by_is_favorited(self, queryset, name, value):
         if value:
@@ -38,7 +51,3 @@ class RecipeFilter(FilterSet):
                 recipes_shoppingcart__user_id=self.request.user.id
             )
         return queryset
-
-
-class IngredientFilter(SearchFilter):
-    search_param = 'name'
@@ -1,5 +1,108 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class LimitPagePagination(PageNumberPagination):
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    cursor_ordering = ('-pub_date', '-id')
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            self.ordering = None
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        self.ordering = getattr(view, 'cursor_ordering', self.cursor_ordering)
+        self.model = queryset.model
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self.invert(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+        has_next, has_previous = has_more, position is not None
+        if reverse:
+            has_next, has_previous = has_previous, has_more
+        self.next_position = self.previous_position = None
+        if results and has_next:
+            self.next_position = self.get_position(results[-1])
+        if results and has_previous:
+            self.previous_position = self.get_position(results[0])
+        return results
+
+    def get_paginated_response(self, data):
+        if self.ordering is None:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.encode_cursor(self.next_position, False),
+            'previous': self.encode_cursor(self.previous_position, True),
+            'results': data,
+        })
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def get_field(self, field):
+        return self.model._meta.get_field(field.lstrip('-'))
+
+    def get_position(self, instance):
+        return [
+            self.get_field(field).value_to_string(instance)
+            for field in self.ordering
+        ]
+
+    def after(self, ordering, position):
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def decode_cursor(self, request):
+        cursor = request.query_params[self.cursor_query_param]
+        if not cursor:
+            return None, False
+        try:
+            data = json.loads(urlsafe_b64decode(cursor.encode('ascii')))
+            position = [
+                self.get_field(field).to_python(value)
+                for field, value in zip(self.ordering, data['p'])
+            ]
+            reverse = bool(data['r'])
+        except (BinasciiError, ValueError, KeyError, TypeError,
+                ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        if position is None:
+            return None
+        cursor = urlsafe_b64encode(
+            json.dumps({'p': position, 'r': int(reverse)}).encode('ascii')
+        ).decode('ascii')
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(url, self.cursor_query_param, cursor)
@@ -0,0 +1,60 @@
+from mimetypes import guess_extension
+
+from django.conf import settings
+from rest_framework import parsers, status
+from rest_framework.exceptions import APIException
+
+
+class RequestTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Размер запроса превышает допустимый.'
+    default_code = 'request_too_large'
+
+
+class SizeLimitMixin:
+    """Отклоняет запрос по Content-Length до чтения тела."""
+
+    @staticmethod
+    def get_max_size():
+        return settings.MAX_IMAGE_UPLOAD_SIZE + settings.MAX_FORM_FIELDS_SIZE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        meta = parser_context['request'].META
+        try:
+            content_length = int(meta.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+        if content_length > self.get_max_size():
+            raise RequestTooLarge
+        return super().parse(stream, media_type, parser_context)
+
+
+class JSONParser(SizeLimitMixin, parsers.JSONParser):
+
+    @staticmethod
+    def get_max_size():
+        return (
+            settings.MAX_IMAGE_UPLOAD_SIZE * 4 // 3
+            + settings.MAX_FORM_FIELDS_SIZE
+        )
+
+
+class FormParser(SizeLimitMixin, parsers.FormParser):
+    pass
+
+
+class MultiPartParser(SizeLimitMixin, parsers.MultiPartParser):
+    pass
+
+
+class ImageUploadParser(SizeLimitMixin, parsers.FileUploadParser):
+    media_type = 'image/*'
+
+    @staticmethod
+    def get_max_size():
+        return settings.MAX_IMAGE_UPLOAD_SIZE
+
+    def get_filename(self, stream, media_type, parser_context):
+        return super().get_filename(
+            stream, media_type, parser_context
+        ) or 'image' + (guess_extension(media_type.split(';')[0]) or '')
@@ -1,46 +1,105 @@
 import base64
+import binascii
+import re
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
 from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import transaction
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
+from api.viewer import ViewerRelations
+from foodgram_backend.image_variants import variant_urls
+from recipes.ingredient_catalog import ingredient_catalog
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
                             Tag, ShoppingCart)
+from recipes.shopping_lists import apply_deltas
 from users.models import Subscription
 
 User = get_user_model()
 
+# Символы, которые b64decode без validate пропускает.
+NOT_BASE64 = re.compile(r'[^A-Za-z0-9+/=]')
+
+
+def get_viewer(context, obj):
+    if 'viewer' in context:
+        return context['viewer']
+    request = context.get('request')
+    return ViewerRelations(
+        request.user if request else AnonymousUser(), (obj,)
+    )
+
+
+class DecodedImageFile(TemporaryUploadedFile):
+
+    def __del__(self):
+        self.close()
+
 
 class Base64ImageField(serializers.ImageField):
+    default_error_messages = {
+        'too_large': 'Размер изображения не должен превышать {max_size} байт.',
+        'invalid_base64': 'Изображение должно быть закодировано в base64.',
+    }
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
-
+            start = data.find(';base64,')
+            if start == -1:
+                self.fail('invalid_base64')
+            ext = data[:start].split('/')[-1]
+            data = self.decode(data, start + len(';base64,'), 'temp.' + ext)
+        elif getattr(data, 'size', 0) > settings.MAX_IMAGE_UPLOAD_SIZE:
+            self.fail('too_large', max_size=settings.MAX_IMAGE_UPLOAD_SIZE)
         return super().to_internal_value(data)
 
+    def decode(self, data, offset, name):
+        size = (len(data) - offset) * 3 // 4
+        if size > settings.MAX_IMAGE_UPLOAD_SIZE:
+            self.fail('too_large', max_size=settings.MAX_IMAGE_UPLOAD_SIZE)
+        try:
+            if size <= settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+                return ContentFile(base64.b64decode(data[offset:]), name=name)
+            file = DecodedImageFile(name, None, size, None)
+            chunk_size = settings.IMAGE_DECODE_CHUNK_SIZE
+            tail = ''
+            for start in range(offset, len(data), chunk_size):
+                # Переносы строк сдвигают границы четвёрок base64,
+                # поэтому неполная четвёрка уходит в следующий кусок.
+                chunk = tail + NOT_BASE64.sub(
+                    '', data[start:start + chunk_size]
+                )
+                cut = len(chunk) - len(chunk) % 4
+                file.write(base64.b64decode(chunk[:cut]))
+                tail = chunk[cut:]
+            file.write(base64.b64decode(tail))
+        except binascii.Error:
+            self.fail('invalid_base64')
+        file.size = file.tell()
+        file.seek(0)
+        return file
+
 
 class UserListSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
+    avatar_variants = serializers.SerializerMethodField()
 
     class Meta:
         fields = (
             'email', 'id', 'username', 'first_name', 'last_name',
-            'is_subscribed', 'avatar'
+            'is_subscribed', 'avatar', 'avatar_variants'
         )
         model = User
 
     def get_is_subscribed(self, obj):
-        return bool(
-            self.context.get('request')
-            and self.context['request'].user.is_authenticated
-            and Subscription.objects.filter(
-                user=self.context['request'].user, subscription=obj
-            ).exists()
-        )
+        return get_viewer(self.context, obj).is_subscribed(obj)
+
+    def get_avatar_variants(self, obj):
+        return variant_urls(obj.avatar, 'avatar', self.context.get('request'))
 
 
 class AvatarSerializer(serializers.ModelSerializer):
@@ -75,7 +134,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class CreateIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
 
     class Meta:
         model = RecipeIngredients
@@ -83,28 +142,26 @@ class CreateIngredientSerializer(serializers.ModelSerializer):
 
 
 class RecipeIngredientsSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        source='ingredient.id',
-        queryset=Ingredient.objects.all()
-    )
-    name = serializers.CharField(
-        source='ingredient.name',
-        read_only=True
-    )
-    measurement_unit = serializers.CharField(
-        source='ingredient.measurement_unit',
-        read_only=True
-    )
+    id = serializers.IntegerField(source='ingredient_id', read_only=True)
+    name = serializers.SerializerMethodField()
+    measurement_unit = serializers.SerializerMethodField()
 
     class Meta:
         model = RecipeIngredients
         fields = ('id', 'name', 'measurement_unit', 'amount')
-        validators = [
-            UniqueTogetherValidator(
-                queryset=RecipeIngredients.objects.all(),
-                fields=('recipe', 'ingredient')
-            )
-        ]
+
+    @staticmethod
+    def get_ingredient(obj):
+        return (
+            ingredient_catalog.get(obj.ingredient_id)
+            or IngredientSerializer(obj.ingredient).data
+        )
+
+    def get_name(self, obj):
+        return self.get_ingredient(obj)['name']
+
+    def get_measurement_unit(self, obj):
+        return self.get_ingredient(obj)['measurement_unit']
 
 
 class SubscribeSerializer(serializers.ModelSerializer):
@@ -127,13 +184,16 @@ class SubscribeSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         serializer = UserSubscriptionsSerializer(
-            instance.subscription,
+            User.objects.get(pk=instance.subscription_id),
             context=self.context
         )
         return serializer.data
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
+    recipe = serializers.PrimaryKeyRelatedField(
+        queryset=Recipe.objects.minified()
+    )
 
     class Meta:
         fields = ('user', 'recipe')
@@ -155,13 +215,20 @@ class FavoriteSerializer(serializers.ModelSerializer):
 
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
         model = Recipe
 
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image, 'recipe', self.context.get('request'))
+
 
 class CartSerializer(serializers.ModelSerializer):
+    recipe = serializers.PrimaryKeyRelatedField(
+        queryset=Recipe.objects.minified()
+    )
 
     class Meta:
         fields = ('user', 'recipe')
@@ -182,30 +249,49 @@ class CartSerializer(serializers.ModelSerializer):
         return serializer.data
 
 
+class UserSubscriptionsListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        authors = list(data)
+        self.child.load_recipes(authors)
+        return super().to_representation(authors)
+
+
 class UserSubscriptionsSerializer(UserListSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         fields = UserListSerializer.Meta.fields + (
             'recipes', 'recipes_count'
         )
         model = User
+        list_serializer_class = UserSubscriptionsListSerializer
 
-    def get_recipes(self, obj):
-        recipes_limit = self.context['request'].query_params.get(
-            'recipes_limit'
+    def get_recipes_limit(self):
+        try:
+            return int(
+                self.context['request'].query_params['recipes_limit']
+            )
+        except (KeyError, ValueError):
+            return None
+
+    def load_recipes(self, authors):
+        self.recipes_by_author = Recipe.objects.latest_by_author(
+            [author.id for author in authors], self.get_recipes_limit()
         )
-        recipes = obj.recipes.all()
-        if recipes_limit:
-            try:
-                recipes = recipes[:int(recipes_limit)]
-            except ValueError:
-                pass
-        return RecipeMinifiedSerializer(recipes, many=True).data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
+    def to_representation(self, instance):
+        if instance.id not in getattr(self, 'recipes_by_author', {}):
+            self.load_recipes((instance,))
+        return super().to_representation(instance)
+
+    def get_is_subscribed(self, obj):
+        return True
+
+    def get_recipes(self, obj):
+        return RecipeMinifiedSerializer(
+            self.recipes_by_author[obj.id], many=True
+        ).data
 
 
 class RecipeListSerializer(serializers.ModelSerializer):
@@ -216,40 +302,22 @@ class RecipeListSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         fields = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
-                  'is_in_shopping_cart', 'name', 'image', 'text',
-                  'cooking_time')
+                  'is_in_shopping_cart', 'name', 'image', 'image_variants',
+                  'text', 'cooking_time')
         model = Recipe
 
-    def get_ingredients(self, obj):
-        queryset = RecipeIngredients.objects.filter(
-            recipe_id=obj.id
-        )
-        return RecipeIngredientsSerializer(queryset, many=True).data
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image, 'recipe', self.context.get('request'))
 
     def get_is_favorited(self, obj):
-        return bool(
-            self.context.get('request')
-            and self.context['request'].user.is_authenticated
-            and obj.id in (
-                self.context['request'].user.recipes_favorite.values_list(
-                    'recipe', flat=True
-                )
-            )
-        )
+        return get_viewer(self.context, obj).is_favorited(obj)
 
     def get_is_in_shopping_cart(self, obj):
-        return bool(
-            self.context.get('request')
-            and self.context['request'].user.is_authenticated
-            and obj.id in (
-                self.context['request'].user.recipes_shoppingcart.values_list(
-                    'recipe', flat=True
-                )
-            )
-        )
+        return get_viewer(self.context, obj).is_in_shopping_cart(obj)
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -257,10 +325,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     author = UserListSerializer(
         read_only=True, default=serializers.CurrentUserDefault()
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all()
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
     ingredients = CreateIngredientSerializer(many=True)
 
     class Meta:
@@ -270,27 +335,92 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         request = self.context.get('request')
-        serializer = RecipeListSerializer(instance,
-                                          context={'request': request})
+        instance = Recipe.objects.with_related().get(pk=instance.pk)
+        serializer = RecipeListSerializer(
+            instance,
+            context={
+                'request': request,
+                'viewer': ViewerRelations(request.user, (instance,))
+            }
+        )
         return serializer.data
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
-        self.add_ingredients(recipe, ingredients)
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(
+                recipe=recipe,
+                ingredient_id=ingredient['id'],
+                amount=ingredient['amount']
+            )
+            for ingredient in ingredients
+        )
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredients')
+        ingredients = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in validated_data.pop('ingredients')
+        }
         tags = validated_data.pop('tags')
         instance = super().update(instance, validated_data)
-        self.add_ingredients(instance, ingredients)
-        instance.tags.clear()
         instance.tags.set(tags)
+        existing = {
+            row.ingredient_id: row
+            for row in RecipeIngredients.objects.filter(
+                recipe=instance
+            ).only('id', 'ingredient_id', 'amount')
+        }
+        deltas = {}
+        created, updated = [], []
+        for ingredient_id, amount in ingredients.items():
+            row = existing.get(ingredient_id)
+            if row is None:
+                created.append(RecipeIngredients(
+                    recipe=instance,
+                    ingredient_id=ingredient_id,
+                    amount=amount
+                ))
+                deltas[ingredient_id] = amount
+            elif row.amount != amount:
+                deltas[ingredient_id] = amount - row.amount
+                row.amount = amount
+                updated.append(row)
+        deleted = []
+        for ingredient_id, row in existing.items():
+            if ingredient_id not in ingredients:
+                deleted.append(row.id)
+                deltas[ingredient_id] = -row.amount
+        if deleted:
+            RecipeIngredients.objects.filter(id__in=deleted).delete()
+        if updated:
+            RecipeIngredients.objects.bulk_update(updated, ('amount',))
+        if created:
+            RecipeIngredients.objects.bulk_create(created)
+        if deltas:
+            apply_deltas(
+                list(
+                    ShoppingCart.objects.filter(
+                        recipe=instance
+                    ).values_list('user_id', flat=True)
+                ),
+                deltas
+            )
         return instance
 
+    @staticmethod
+    def missing_ids(model, ids):
+        return sorted(
+            set(ids) - set(
+                model.objects.filter(id__in=ids).values_list('id', flat=True)
+            )
+        )
+
     def validate(self, data):
         ingredients = data.get('ingredients')
         tags = data.get('tags')
@@ -302,7 +432,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Рецепт должен быть связан хотя бы с одним тегом'
             )
-        ingredient_ids = [ingredient.get('id') for ingredient in ingredients]
+        ingredient_ids = [ingredient['id'] for ingredient in ingredients]
         if len(set(ingredient_ids)) != len(ingredient_ids):
             raise serializers.ValidationError(
                 'Ингредиенты не должны повторяться'
@@ -311,17 +441,18 @@ class RecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Теги не должны повторяться'
             )
+        errors = {}
+        for field, model, ids in (
+            ('ingredients', Ingredient, ingredient_ids),
+            ('tags', Tag, tags),
+        ):
+            missing = self.missing_ids(model, ids)
+            if missing:
+                errors[field] = [
+                    f'Недопустимый первичный ключ "{pk}" - '
+                    'объект не существует.'
+                    for pk in missing
+                ]
+        if errors:
+            raise serializers.ValidationError(errors)
         return data
-
-    @staticmethod
-    def add_ingredients(recipe, ingredients):
-        recipe.ingredients.clear()
-        ingredients_list = [
-            RecipeIngredients(
-                recipe=recipe,
-                ingredient=ingredient.get('id'),
-                amount=ingredient.get('amount')
-            )
-            for ingredient in ingredients
-        ]
-        RecipeIngredients.objects.bulk_create(ingredients_list)
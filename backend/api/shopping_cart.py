@@ -0,0 +1,56 @@
+import io
+from functools import lru_cache
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from reportlab.rl_config import defaultPageSize
+
+from foodgram_backend.cpu_pool import run_in_pool
+
+FONT_NAME = 'DejaVuSerif'
+FONT_SIZE = 14
+LINE_HEIGHT = 20
+MARGIN = 40
+
+
+@lru_cache(maxsize=None)
+def register_font():
+    pdfmetrics.registerFont(TTFont(FONT_NAME, 'DejaVuSerif.ttf', 'UTF-8'))
+
+
+def build_pdf(lines):
+    register_font()
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    current_height = defaultPageSize[1] - MARGIN
+    pdf.setFont(FONT_NAME, FONT_SIZE)
+    for line in lines:
+        if current_height < MARGIN:
+            pdf.showPage()
+            pdf.setFont(FONT_NAME, FONT_SIZE)
+            current_height = defaultPageSize[1] - MARGIN
+        pdf.drawString(MARGIN, current_height, line)
+        current_height -= LINE_HEIGHT
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def render_shopping_cart(ingredients):
+    lines = [
+        f'{ingredient["ingredient__name"]} - {ingredient["sum"]} '
+        f'{ingredient["ingredient__measurement_unit"]}'
+        for ingredient in ingredients
+    ]
+    key = 'shopping_cart_pdf:' + sha256(
+        '\n'.join(lines).encode('utf-8')
+    ).hexdigest()
+    pdf = cache.get(key)
+    if pdf is None:
+        pdf = run_in_pool(build_pdf, lines)
+        cache.set(key, pdf, settings.SHOPPING_CART_PDF_CACHE_TTL)
+    return pdf
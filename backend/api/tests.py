@@ -0,0 +1,1258 @@
+import asyncio
+import base64
+import csv
+import json
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import Future
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.db.backends.postgresql.base import DatabaseWrapper
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from prometheus_client import REGISTRY
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.serializers import Base64ImageField
+from api.shopping_cart import build_pdf, render_shopping_cart
+from foodgram_backend import constants
+from foodgram_backend.asgi import ConcurrentRequests
+from foodgram_backend.cpu_pool import run_in_pool
+from foodgram_backend.db_router import (ReplicaRouter, choose_replica,
+                                        pin_to_primary, pinned_to_primary,
+                                        read_replica, use_primary)
+from foodgram_backend.image_variants import (log_failure, render_variants,
+                                             variant_name, variant_urls)
+from foodgram_backend.lru import MISSING, LRUCache
+from foodgram_backend.response_cache import recipe_responses
+from recipes.ingredient_catalog import IngredientCatalog, ingredient_catalog
+from recipes.management.commands import load_test
+from recipes.management.commands.load_ingredients import iter_json_array
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCart, Tag)
+from recipes.search import postgres_search
+from recipes.shopping_lists import live_totals, stored_totals
+from recipes.tag_masks import mask_bits
+from users.authentication import tokens
+from users.models import Subscription
+
+User = get_user_model()
+
+RECIPES = 60
+
+
+class RecipeQueriesTest(TestCase):
+    """Число запросов к базе не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tags = [
+            Tag.objects.create(name=f'Тег {index}', slug=f'tag{index}')
+            for index in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Продукт {index}', measurement_unit='г'
+            )
+            for index in range(5)
+        ]
+        cls.viewer = User.objects.create_user(
+            username='viewer', email='viewer@example.com', password='pass',
+            first_name='Имя', last_name='Фамилия'
+        )
+        authors = [
+            User.objects.create_user(
+                username=f'author{index}',
+                email=f'author{index}@example.com',
+                password='pass', first_name='Имя', last_name='Фамилия'
+            )
+            for index in range(4)
+        ]
+        for index in range(RECIPES):
+            recipe = Recipe.objects.create(
+                author=authors[index % len(authors)], name=f'Рецепт {index}',
+                text='Описание', cooking_time=10
+            )
+            recipe.tags.set(tags[:index % len(tags) + 1])
+            RecipeIngredients.objects.bulk_create(
+                RecipeIngredients(
+                    recipe=recipe, ingredient=ingredient, amount=100
+                )
+                for ingredient in ingredients[:index % len(ingredients) + 1]
+            )
+            if index % 2:
+                Favorite.objects.create(user=cls.viewer, recipe=recipe)
+            if index % 3:
+                ShoppingCart.objects.create(user=cls.viewer, recipe=recipe)
+        Subscription.objects.create(user=cls.viewer, subscription=authors[0])
+        cls.recipe = Recipe.objects.first()
+
+    def setUp(self):
+        caches['responses'].clear()
+        ingredient_catalog.load()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def assert_queries(self, client, url, queries):
+        with self.assertNumQueries(queries):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list(self):
+        for limit in (10, 50):
+            with self.subTest(limit=limit):
+                response = self.assert_queries(
+                    self.anonymous, f'/api/recipes/?limit={limit}', 4
+                )
+                self.assertEqual(len(response.data['results']), limit)
+                caches['responses'].clear()
+                self.assert_queries(
+                    self.client, f'/api/recipes/?limit={limit}', 8
+                )
+
+    def test_viewer_flags(self):
+        response = self.assert_queries(
+            self.client, f'/api/recipes/?limit={RECIPES}', 8
+        )
+        for recipe in response.data['results']:
+            index = int(recipe['name'].split()[-1])
+            with self.subTest(index=index):
+                self.assertEqual(recipe['is_favorited'], bool(index % 2))
+                self.assertEqual(
+                    recipe['is_in_shopping_cart'], bool(index % 3)
+                )
+                self.assertEqual(
+                    recipe['author']['is_subscribed'], index % 4 == 0
+                )
+
+    def test_cursor_list(self):
+        for limit in (10, 50):
+            with self.subTest(limit=limit):
+                self.assert_queries(
+                    self.anonymous, f'/api/recipes/?cursor=&limit={limit}', 3
+                )
+
+    def test_cursor_walk(self):
+        expected = list(
+            Recipe.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        )
+        url, pages = '/api/recipes/?cursor=&limit=7', []
+        while url:
+            data = self.anonymous.get(url).data
+            pages.append([recipe['id'] for recipe in data['results']])
+            url, previous = data['next'], data['previous']
+        self.assertEqual(sum(pages, []), expected)
+        for page in reversed(pages[:-1]):
+            data = self.anonymous.get(previous).data
+            self.assertEqual(
+                [recipe['id'] for recipe in data['results']], page
+            )
+            previous = data['previous']
+        self.assertIsNone(previous)
+        response = self.anonymous.get('/api/recipes/?cursor=invalid')
+        self.assertEqual(response.status_code, 404)
+
+    def test_detail(self):
+        url = f'/api/recipes/{self.recipe.id}/'
+        self.assert_queries(self.anonymous, url, 4)
+        self.assert_queries(self.client, url, 8)
+
+    def test_unknown_ingredient(self):
+        later = time.monotonic() + 2
+        with self.assertNumQueries(0), mock.patch(
+            'recipes.ingredient_catalog.monotonic', return_value=later
+        ):
+            for ingredient_id in range(10 ** 6, 10 ** 6 + 5):
+                response = self.anonymous.get(
+                    f'/api/ingredients/{ingredient_id}/'
+                )
+                self.assertEqual(response.status_code, 404)
+
+
+class RecipeSearchTest(TestCase):
+    """Поиск сочетается с фильтрами и ранжирует совпадения."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.soups, cls.salads = (
+            Tag.objects.create(name=name, slug=slug)
+            for name, slug in (('Супы', 'soups'), ('Салаты', 'salads'))
+        )
+        cls.cook, cls.other = (
+            User.objects.create_user(
+                username=username, email=f'{username}@example.com',
+                password='pass', first_name='Имя', last_name='Фамилия'
+            )
+            for username in ('cook', 'other')
+        )
+        cls.recipes = {}
+        for name, text, author, tag in (
+            ('Салат оливье', 'Подаётся к борщу', cls.cook, cls.salads),
+            ('Борщ с говядиной', 'Описание', cls.cook, cls.soups),
+            ('Котлеты', 'Описание', cls.cook, cls.soups),
+            ('Борщ постный', 'Описание', cls.other, cls.soups),
+        ):
+            recipe = Recipe.objects.create(
+                author=author, name=name, text=text, cooking_time=10
+            )
+            recipe.tags.set((tag,))
+            cls.recipes[name] = recipe.id
+        Favorite.objects.create(
+            user=cls.other, recipe_id=cls.recipes['Салат оливье']
+        )
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.other)
+
+    def search(self, query):
+        response = self.client.get(f'/api/recipes/?search={query}')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_filters(self):
+        for query, names in (
+            (f'author={self.cook.id}', {'Салат оливье', 'Борщ с говядиной'}),
+            ('tags=soups', {'Борщ с говядиной', 'Борщ постный'}),
+            ('is_favorited=1', {'Салат оливье'}),
+        ):
+            with self.subTest(query=query):
+                data = self.search(f'борщ&{query}')
+                self.assertEqual(data['count'], len(names))
+                self.assertEqual(
+                    {recipe['name'] for recipe in data['results']}, names
+                )
+
+    def test_ordering(self):
+        data = self.search('борщ&limit=2')
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(
+            {recipe['name'] for recipe in data['results']},
+            {'Борщ с говядиной', 'Борщ постный'}
+        )
+        self.assertEqual(
+            self.search('борщ&page=2&limit=2')['results'][0]['name'],
+            'Салат оливье'
+        )
+
+    def test_postgres_query(self):
+        postgres = DatabaseWrapper({
+            **connection.settings_dict,
+            'ENGINE': 'django.db.backends.postgresql',
+        })
+        queryset = postgres_search(
+            Recipe.objects.filter(author=self.cook), 'борщ'
+        ).order_by('-search_rank')
+        sql, params = queryset.query.get_compiler(
+            connection=postgres
+        ).as_sql()
+        self.assertIn('"recipes_recipe"."author_id" = %s', sql)
+        self.assertIn("search_vector @@ websearch_to_tsquery(", sql)
+        self.assertIn('ORDER BY "search_rank" DESC', sql)
+        self.assertNotIn('LIMIT', sql)
+        self.assertEqual(params.count('борщ'), 2)
+
+
+def png_image(size=32):
+    image = BytesIO()
+    Image.frombytes('RGB', (size, size), os.urandom(size * size * 3)).save(
+        image, 'PNG'
+    )
+    return image.getvalue()
+
+
+@override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=1024,
+                   IMAGE_DECODE_CHUNK_SIZE=1000)
+class Base64ImageFieldTest(TestCase):
+    """Большое изображение в base64 декодируется по кускам."""
+
+    def test_wrapped_payload(self):
+        content = png_image()
+        for name, encoded in (
+            ('plain', base64.b64encode(content).decode()),
+            ('wrapped', base64.encodebytes(content).decode()),
+            ('crlf', base64.encodebytes(content).decode().replace(
+                '\n', '\r\n'
+            )),
+        ):
+            with self.subTest(name):
+                self.assertGreater(len(encoded), 1000)
+                file = Base64ImageField().to_internal_value(
+                    f'data:image/png;base64,{encoded}'
+                )
+                self.assertEqual(file.read(), content)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class AvatarUploadTest(TestCase):
+    """Аватар загружается файлом без base64 и с ограничением размера."""
+
+    url = '/api/users/me/avatar/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='pass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.content = png_image()
+
+    def assert_uploaded(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar.read(), self.content)
+
+    def test_multipart(self):
+        self.assert_uploaded(self.client.put(
+            self.url,
+            {'avatar': SimpleUploadedFile(
+                'avatar.png', self.content, 'image/png'
+            )},
+            format='multipart'
+        ))
+
+    def test_binary(self):
+        self.assert_uploaded(self.client.put(
+            self.url, self.content, content_type='image/png'
+        ))
+
+    def test_too_large(self):
+        with self.settings(MAX_IMAGE_UPLOAD_SIZE=len(self.content) - 1):
+            response = self.client.put(
+                self.url, self.content, content_type='image/png'
+            )
+        self.assertEqual(response.status_code, 413)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), MEDIA_URL='/media/',
+                   IMAGE_VARIANTS={'recipe': {'small': 64}})
+class ImageVariantsTest(TestCase):
+    """Отсутствующий вариант изображения заменяется оригиналом."""
+
+    def test_variant_urls(self):
+        image = Recipe(image='recipes/dish.png').image
+        self.assertEqual(variant_urls(image, 'recipe'), {
+            'small': {'webp': image.url, 'jpeg': image.url},
+        })
+        default_storage.save(
+            variant_name(image.name, 'small', 'webp'), ContentFile(b'webp')
+        )
+        self.assertEqual(variant_urls(image, 'recipe'), {
+            'small': {
+                'webp': '/media/variants/small/recipes/dish.webp',
+                'jpeg': image.url,
+            },
+        })
+
+    def test_render(self):
+        name = default_storage.save(
+            'recipes/rendered.png', ContentFile(png_image(200))
+        )
+        render_variants(name, {'small': 64})
+        for format in ('webp', 'jpeg'):
+            with self.subTest(format=format):
+                with default_storage.open(
+                    variant_name(name, 'small', format)
+                ) as file:
+                    image = Image.open(file)
+                    self.assertEqual(image.format, format.upper())
+                    self.assertEqual(image.size, (64, 64))
+
+    def test_log_failure(self):
+        future = Future()
+        future.set_exception(OSError('нет файла'))
+        with self.assertLogs('foodgram_backend.image_variants', 'ERROR'):
+            log_failure('recipes/dish.png', future)
+
+
+TEMP_CACHES = {
+    alias: {**config, 'LOCATION': tempfile.mkdtemp()}
+    for alias, config in settings.CACHES.items()
+}
+
+
+@override_settings(CACHES=TEMP_CACHES)
+class PrimaryStickinessTest(TestCase):
+    """Закрепление за основной базой живёт DATABASE_STICKINESS секунд."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='writer', email='writer@example.com', password='pass'
+        )
+
+    def test_pin_lifetime(self):
+        pin_to_primary(self.user)
+        self.assertTrue(pinned_to_primary(self.user))
+        expired = time.time() + settings.DATABASE_STICKINESS + 1
+        with mock.patch('time.time', return_value=expired):
+            self.assertFalse(pinned_to_primary(self.user))
+
+    def test_pins_do_not_evict_version(self):
+        version = recipe_responses.version()
+        pin_to_primary(self.user)
+        for user_id in range(1000):
+            pin_to_primary(User(id=-user_id - 1))
+        self.assertTrue(pinned_to_primary(self.user))
+        self.assertEqual(recipe_responses.version(), version)
+
+
+class ReplicaRouterTest(SimpleTestCase):
+    """Выбор базы для чтения и пропуск недоступных реплик."""
+
+    def test_db_for_read(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Recipe), 'default')
+        token = read_replica.set('replica_1')
+        try:
+            self.assertEqual(router.db_for_read(Recipe), 'replica_1')
+            with use_primary():
+                self.assertEqual(router.db_for_read(Recipe), 'default')
+            self.assertEqual(router.db_for_read(Recipe), 'replica_1')
+            with mock.patch.object(connection, 'in_atomic_block', True):
+                self.assertEqual(router.db_for_read(Recipe), 'default')
+        finally:
+            read_replica.reset(token)
+        self.assertEqual(router.db_for_write(Recipe), 'default')
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_unavailable_replica(self):
+        with mock.patch.dict('foodgram_backend.db_router._unavailable'):
+            with mock.patch.object(
+                connection, 'ensure_connection', side_effect=DatabaseError
+            ) as ensure_connection:
+                self.assertIsNone(choose_replica())
+                self.assertIsNone(choose_replica())
+            self.assertEqual(ensure_connection.call_count, 1)
+            later = time.monotonic() + settings.DATABASE_REPLICA_RETRY + 1
+            with mock.patch(
+                'foodgram_backend.db_router.monotonic', return_value=later
+            ), mock.patch.object(connection, 'ensure_connection'):
+                self.assertEqual(choose_replica(), 'default')
+
+
+@override_settings(CACHES=TEMP_CACHES, DATABASE_REPLICAS=['replica_1'])
+class PrimaryAfterWriteTest(TestCase):
+    """После записи пользователь читает из основной базы."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='writer', email='writer@example.com', password='pass'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.user, name='Рецепт', text='Описание', cooking_time=10
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pin_after_write(self):
+        url = f'/api/recipes/{self.recipe.id}/favorite/'
+        with mock.patch(
+            'api.viewsets.choose_replica', return_value=None
+        ) as choose:
+            self.client.get('/api/recipes/')
+            self.assertEqual(choose.call_count, 1)
+            self.assertFalse(pinned_to_primary(self.user))
+            self.assertEqual(self.client.post(url).status_code, 201)
+            self.assertTrue(pinned_to_primary(self.user))
+            self.client.get('/api/recipes/')
+            self.assertEqual(choose.call_count, 1)
+
+    def test_failed_write(self):
+        self.assertEqual(
+            self.client.post('/api/recipes/', {}).status_code, 400
+        )
+        self.assertFalse(pinned_to_primary(self.user))
+
+
+@override_settings(CACHES=TEMP_CACHES)
+class ProcessCachesTest(TestCase):
+    """Кэши процессов сбрасываются изменениями из других процессов."""
+
+    def test_lru_cache(self):
+        local, other = (
+            LRUCache('test', 10, 60, version_alias='shared') for _ in range(2)
+        )
+        other.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+        with self.captureOnCommitCallbacks(execute=True):
+            local.delete('key')
+        self.assertIs(other.get('key'), MISSING)
+
+    def test_ingredient_catalog(self):
+        other = IngredientCatalog(60)
+        self.assertEqual(other.search('соль'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='Соль', measurement_unit='г')
+        self.assertEqual(
+            [item['name'] for item in other.search('соль')], ['Соль']
+        )
+
+
+class AuthorChangesTest(TestCase):
+    """Рецепты автора обновляются только при смене его полей в ответах."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='chef', email='chef@example.com', password='pass',
+            first_name='Имя', last_name='Фамилия'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            cooking_time=10
+        )
+
+    def assert_touched(self, touched):
+        updated_at = self.recipe.updated_at
+        self.author.save()
+        self.recipe.refresh_from_db()
+        if touched:
+            self.assertGreater(self.recipe.updated_at, updated_at)
+        else:
+            self.assertEqual(self.recipe.updated_at, updated_at)
+
+    def test_private_fields(self):
+        self.author.set_password('secret')
+        self.assert_touched(False)
+        self.author.is_active = False
+        self.assert_touched(False)
+
+    def test_author_fields(self):
+        self.author.first_name = 'Другое'
+        self.assert_touched(True)
+        self.author.avatar = 'users/avatar.png'
+        self.assert_touched(True)
+
+
+class LoadIngredientsTest(TestCase):
+    """Справочники загружаются по частям и повторно без дублей."""
+
+    rows = [
+        {'name': f'продукт "{index}"', 'measurement_unit': 'г'}
+        for index in range(50)
+    ]
+
+    def test_iter_json_array(self):
+        content = json.dumps(self.rows, ensure_ascii=False, indent=2)
+        for chunk_size in (1, 7, 4096):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(
+                    list(iter_json_array(StringIO(content), chunk_size)),
+                    self.rows
+                )
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.json', encoding='utf-8'
+        ) as file:
+            json.dump(self.rows, file, ensure_ascii=False)
+            file.flush()
+            call_command('load_ingredients', path=file.name, stdout=StringIO())
+        self.assertEqual(
+            list(Ingredient.objects.order_by('id').values(
+                'name', 'measurement_unit'
+            )),
+            self.rows
+        )
+
+    def test_repeated_load(self):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.csv', encoding='utf-8'
+        ) as file:
+            csv.writer(file).writerows(
+                (row['name'], row['measurement_unit']) for row in self.rows
+            )
+            file.flush()
+            for _ in range(2):
+                call_command(
+                    'load_ingredients', path=file.name, batch_size=7,
+                    stdout=StringIO()
+                )
+        self.assertEqual(Ingredient.objects.count(), len(self.rows))
+        for _ in range(2):
+            call_command('load_tags', stdout=StringIO())
+        self.assertEqual(Tag.objects.count(), 5)
+        self.assertEqual(
+            len(set(Tag.objects.values_list('bit', flat=True))), 5
+        )
+
+
+class TagMasksTest(TestCase):
+    """Число битов маски берётся из кэша и сбрасывается с тегами."""
+
+    def test_mask_bits(self):
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+        self.assertEqual(mask_bits(), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(mask_bits(), 1)
+        tag = Tag.objects.create(name='Обед', slug='lunch')
+        self.assertEqual(mask_bits(), 2)
+        tag.delete()
+        self.assertEqual(mask_bits(), 1)
+        call_command('load_tags', stdout=StringIO())
+        self.assertEqual(mask_bits(), Tag.objects.count())
+
+    def test_filter(self):
+        tags = [
+            Tag.objects.create(name=f'Тег {index}', slug=f'tag{index}')
+            for index in range(3)
+        ]
+        author = User.objects.create_user(
+            username='cook', email='cook@example.com', password='pass'
+        )
+        for index in range(len(tags)):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {index}', text='Описание',
+                cooking_time=10
+            )
+            recipe.tags.set(tags[index:])
+        response = self.client.get('/api/recipes/?tags=tag0&tags=tag1')
+        self.assertEqual(response.data['count'], 2)
+        with self.assertNumQueries(5):
+            self.client.get('/api/recipes/?tags=tag2&limit=1')
+
+
+class ShortLinksTest(TestCase):
+    """Короткие ссылки уникальны и раздаются из кэша процесса."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='cook', email='cook@example.com', password='pass'
+        )
+
+    def create_recipe(self):
+        return Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            cooking_time=10
+        )
+
+    def test_collisions(self):
+        with mock.patch.object(
+            Recipe, 'generate_hash', side_effect=lambda length: 'a' * length
+        ):
+            first, second = self.create_recipe(), self.create_recipe()
+        self.assertEqual(first.hash, 'a' * constants.SHORT_LINK_MIN_LENGTH)
+        self.assertEqual(
+            second.hash, 'a' * (constants.SHORT_LINK_MIN_LENGTH + 1)
+        )
+
+    def test_redirect(self):
+        recipe = self.create_recipe()
+        url = f'/s/{recipe.hash}/'
+        response = self.client.get(url)
+        self.assertRedirects(
+            response, f'http://testserver/recipes/{recipe.id}/',
+            fetch_redirect_response=False
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 302)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ShoppingCartPdfTest(TestCase):
+    """Список покупок переносится на новые страницы и кэшируется."""
+
+    ingredients = [
+        {
+            'ingredient__name': f'Продукт {index}',
+            'ingredient__measurement_unit': 'г',
+            'sum': 100,
+        }
+        for index in range(100)
+    ]
+
+    def test_pages(self):
+        pdf = build_pdf([f'строка {index}' for index in range(100)])
+        self.assertEqual(len(re.findall(rb'/Type /Page\b(?!s)', pdf)), 3)
+
+    def test_cache(self):
+        caches['default'].clear()
+        with mock.patch(
+            'api.shopping_cart.run_in_pool',
+            side_effect=lambda function, *args: function(*args)
+        ) as run_in_pool:
+            pdf = render_shopping_cart(self.ingredients)
+            self.assertEqual(render_shopping_cart(self.ingredients), pdf)
+            render_shopping_cart(self.ingredients[:1])
+        self.assertEqual(run_in_pool.call_count, 2)
+
+
+class RecipeWriteTestCase(TestCase):
+    """Рецепт автора в списках покупок двух пользователей."""
+
+    def setUp(self):
+        self.tag = Tag.objects.create(name='Обед', slug='lunch')
+        self.ingredients = [
+            Ingredient.objects.create(
+                name=f'Продукт {index}', measurement_unit='г'
+            )
+            for index in range(4)
+        ]
+        self.author, self.buyer = (
+            User.objects.create_user(
+                username=username, email=f'{username}@example.com',
+                password='pass'
+            )
+            for username in ('author', 'buyer')
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            cooking_time=10
+        )
+        self.recipe.tags.set((self.tag,))
+        for ingredient in self.ingredients[:3]:
+            RecipeIngredients.objects.create(
+                recipe=self.recipe, ingredient=ingredient, amount=100
+            )
+        for user in (self.author, self.buyer):
+            ShoppingCart.objects.create(user=user, recipe=self.recipe)
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def update_recipe(self, amounts):
+        return self.client.patch(
+            f'/api/recipes/{self.recipe.id}/',
+            {
+                'tags': [self.tag.id],
+                'ingredients': [
+                    {'id': self.ingredients[index].id, 'amount': amount}
+                    for index, amount in amounts.items()
+                ],
+                'name': 'Рецепт',
+                'text': 'Описание',
+                'cooking_time': 10,
+            },
+            format='json'
+        )
+
+
+class RecipeUpdateTest(RecipeWriteTestCase):
+    """Изменение рецепта затрагивает только изменившиеся ингредиенты."""
+
+    def rows(self):
+        return {
+            ingredient_id: (row_id, amount)
+            for row_id, ingredient_id, amount
+            in RecipeIngredients.objects.filter(
+                recipe=self.recipe
+            ).values_list('id', 'ingredient_id', 'amount')
+        }
+
+    def test_diff(self):
+        before = self.rows()
+        ids = [ingredient.id for ingredient in self.ingredients]
+        response = self.update_recipe({0: 100, 1: 250, 3: 50})
+        self.assertEqual(response.status_code, 200)
+        after = self.rows()
+        self.assertEqual(after[ids[0]], before[ids[0]])
+        self.assertEqual(after[ids[1]], (before[ids[1]][0], 250))
+        self.assertNotIn(ids[2], after)
+        self.assertEqual(after[ids[3]][1], 50)
+
+    def test_atomic(self):
+        before = self.rows()
+        with mock.patch(
+            'api.serializers.apply_deltas', side_effect=DatabaseError
+        ), self.assertRaises(DatabaseError):
+            self.update_recipe({0: 100, 1: 250, 3: 50})
+        self.assertEqual(self.rows(), before)
+
+
+class ShoppingListTotalsTest(RecipeWriteTestCase):
+    """Итоги списка покупок совпадают с пересчётом по рецептам."""
+
+    def assert_totals(self):
+        user_ids = (self.author.id, self.buyer.id)
+        self.assertEqual(stored_totals(user_ids), live_totals(user_ids))
+
+    def test_totals(self):
+        self.assert_totals()
+        response = self.update_recipe({0: 100, 1: 250, 3: 50})
+        self.assertEqual(response.status_code, 200)
+        self.assert_totals()
+        url = f'/api/recipes/{self.recipe.id}/shopping_cart/'
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assert_totals()
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assert_totals()
+        self.assertEqual(
+            stored_totals((self.buyer.id,)),
+            {
+                (self.buyer.id, self.ingredients[index].id): amount
+                for index, amount in ((0, 100), (1, 250), (3, 50))
+            }
+        )
+
+
+class IngredientCatalogTest(TestCase):
+    """Поиск ингредиентов: сначала по началу названия, затем по вхождению."""
+
+    def test_search(self):
+        for name in ('Морская соль', 'Сольный сыр', 'Соль', 'Сахар'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/ingredients/?name=СОЛ')
+        self.assertEqual(
+            [ingredient['name'] for ingredient in response.data],
+            ['Соль', 'Сольный сыр', 'Морская соль']
+        )
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/ingredients/')
+        self.assertEqual(len(response.data), 4)
+
+
+class SubscriptionsTest(TestCase):
+    """Страница подписок загружает рецепты всех авторов одним запросом."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(
+            username='viewer', email='viewer@example.com', password='pass'
+        )
+        cls.recipes = {}
+        for index in range(3):
+            author = User.objects.create_user(
+                username=f'author{index}',
+                email=f'author{index}@example.com', password='pass'
+            )
+            Subscription.objects.create(user=cls.viewer, subscription=author)
+            cls.recipes[author.id] = [
+                Recipe.objects.create(
+                    author=author, name=f'Рецепт {number}', text='Описание',
+                    cooking_time=10
+                ).id
+                for number in range(4)
+            ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def test_recipes_limit(self):
+        for limit, queries in ((1, 3), (3, 3)):
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(queries):
+                    response = self.client.get(
+                        f'/api/users/subscriptions/?recipes_limit={limit}'
+                    )
+                self.assertEqual(response.data['count'], 3)
+                for author in response.data['results']:
+                    self.assertEqual(author['recipes_count'], 4)
+                    self.assertEqual(
+                        [recipe['id'] for recipe in author['recipes']],
+                        self.recipes[author['id']][::-1][:limit]
+                    )
+
+
+class ConditionalGetTest(TestCase):
+    """ETag меняется вместе с рецептами и связями пользователя."""
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='pass'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.user, name='Рецепт', text='Описание', cooking_time=10
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_not_modified(self, url, changed):
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            changed()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detail(self):
+        self.assert_not_modified(
+            f'/api/recipes/{self.recipe.id}/',
+            lambda: Favorite.objects.create(
+                user=self.user, recipe=self.recipe
+            )
+        )
+
+    def test_list(self):
+        def update():
+            self.recipe.name = 'Новое название'
+            self.recipe.save()
+
+        self.assert_not_modified('/api/recipes/', update)
+
+    def test_anonymous_last_modified(self):
+        url = f'/api/recipes/{self.recipe.id}/'
+        last_modified = APIClient().get(url)['Last-Modified']
+        response = APIClient().get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class ResponseCacheTest(TestCase):
+    """Анонимные ответы берутся из кэша до смены версии рецептов."""
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='pass'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.user, name='Рецепт', text='Описание', cooking_time=10
+        )
+
+    @staticmethod
+    def requests(result):
+        return REGISTRY.get_sample_value(
+            'foodgram_cache_requests_total',
+            {'cache': 'responses', 'result': result}
+        ) or 0
+
+    def test_anonymous(self):
+        client = APIClient()
+        hits, misses = self.requests('hit'), self.requests('miss')
+        for url in ('/api/recipes/', f'/api/recipes/{self.recipe.id}/'):
+            with self.subTest(url=url):
+                self.assertEqual(client.get(url)['X-Cache'], 'MISS')
+                with self.assertNumQueries(0):
+                    self.assertEqual(client.get(url)['X-Cache'], 'HIT')
+        self.assertEqual(self.requests('hit') - hits, 2)
+        self.assertEqual(self.requests('miss') - misses, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = 'Новое название'
+            self.recipe.save()
+        response = client.get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['name'], 'Новое название')
+
+    def test_authenticated(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for _ in range(2):
+            self.assertNotIn('X-Cache', client.get('/api/recipes/'))
+
+
+class CountersTest(TestCase):
+    """Счётчики избранного, покупок, подписчиков и рецептов."""
+
+    def setUp(self):
+        self.author, self.reader = (
+            User.objects.create_user(
+                username=username, email=f'{username}@example.com',
+                password='pass'
+            )
+            for username in ('author', 'reader')
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание', cooking_time=10
+        )
+
+    def counters(self):
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        return (
+            self.recipe.favorites_count, self.recipe.cart_count,
+            self.author.followers_count, self.author.recipes_count
+        )
+
+    def test_signals(self):
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        related = (
+            Favorite.objects.create(user=self.reader, recipe=self.recipe),
+            ShoppingCart.objects.create(user=self.reader, recipe=self.recipe),
+            Subscription.objects.create(
+                user=self.reader, subscription=self.author
+            ),
+        )
+        self.assertEqual(self.counters(), (1, 1, 1, 1))
+        stale.name = 'Новое название'
+        stale.save()
+        self.assertEqual(self.counters(), (1, 1, 1, 1))
+        for instance in related:
+            instance.delete()
+        self.assertEqual(self.counters(), (0, 0, 0, 1))
+
+    def test_reconcile(self):
+        Favorite.objects.create(user=self.reader, recipe=self.recipe)
+        Recipe.objects.update(favorites_count=5, cart_count=2)
+        User.objects.filter(pk=self.author.pk).update(recipes_count=0)
+        with self.assertRaises(CommandError):
+            call_command('reconcile_counters', verify=True, stdout=StringIO())
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self.counters(), (1, 0, 0, 1))
+        call_command('reconcile_counters', verify=True, stdout=StringIO())
+
+
+class RecipeAdminTest(TestCase):
+    """Список рецептов в админке фильтруется по автору и ищет по индексу."""
+
+    def setUp(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        self.client.force_login(admin)
+        self.cook = User.objects.create_user(
+            username='cook', email='cook@example.com', password='pass'
+        )
+        for author, name in (
+            (self.cook, 'Борщ'), (self.cook, 'Котлеты'), (admin, 'Борщ')
+        ):
+            Recipe.objects.create(
+                author=author, name=name, text='Описание', cooking_time=10
+            )
+
+    def changelist(self, query):
+        response = self.client.get(f'/admin/recipes/recipe/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return sorted(
+            (recipe.author.username, recipe.name)
+            for recipe in response.context['cl'].result_list
+        )
+
+    def test_filters(self):
+        cook = [('cook', 'Борщ'), ('cook', 'Котлеты')]
+        self.assertEqual(self.changelist(f'author={self.cook.id}'), cook)
+        self.assertEqual(self.changelist('author=cook'), cook)
+        self.assertEqual(
+            self.changelist('author=cook&q=борщ'), [('cook', 'Борщ')]
+        )
+        self.assertEqual(self.changelist('author=nobody'), [])
+
+
+class ConcurrencyLimitsTest(TestCase):
+    """ASGI ограничивает число запросов, тяжёлая работа идёт в пуле."""
+
+    def test_concurrent_requests(self):
+        running = peak = 0
+
+        async def application(scope, receive, send):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        limited = ConcurrentRequests(application, 2)
+
+        async def requests():
+            await asyncio.gather(*(
+                limited({'type': 'http'}, None, None) for _ in range(5)
+            ))
+
+        asyncio.run(requests())
+        self.assertEqual(peak, 2)
+
+    def test_cpu_pool(self):
+        self.assertEqual(run_in_pool(max, (1, 3)), 3)
+
+
+class LoadTestReportTest(TestCase):
+    """Отчёт нагрузочного теста и сравнение с базовым прогоном."""
+
+    options = {'tolerance': 0.2, 'min_delta': 5, 'min_requests': 20}
+
+    @staticmethod
+    def row(p95, requests=100, errors=0, rps=50):
+        return {'requests': requests, 'errors': errors, 'rps': rps,
+                'p50': p95 / 2, 'p95': p95, 'p99': p95 * 2}
+
+    def test_percentile(self):
+        timings = list(range(1, 101))
+        self.assertEqual(
+            [load_test.percentile(timings, percent)
+             for percent in load_test.PERCENTILES],
+            [50, 95, 99]
+        )
+
+    def test_mix(self):
+        command = load_test.Command()
+        mix = command.get_mix({'mix': ['recipes=0', 'feed=3']})
+        self.assertNotIn('recipes', mix)
+        self.assertEqual(mix['feed'], 3)
+        for item in ('unknown=1', 'feed=x'):
+            with self.subTest(item=item), self.assertRaises(CommandError):
+                command.get_mix({'mix': [item]})
+
+    def test_compare(self):
+        baseline = {'GET recipes': self.row(100)}
+        for row, regressions in (
+            (self.row(110), 0),
+            (self.row(130), 1),
+            (self.row(130, requests=10), 0),
+            (self.row(100, rps=30), 1),
+            (self.row(100, errors=5), 1),
+        ):
+            with self.subTest(row=row):
+                self.assertEqual(len(load_test.Command().compare(
+                    {'GET recipes': row}, baseline, self.options
+                )), regressions)
+
+
+class GenerateDatasetTest(TestCase):
+    """Генерация синтетических данных для нагрузочного теста."""
+
+    options = {'users': 5, 'recipes': 20, 'favorites': 30, 'carts': 10,
+               'subscriptions': 10, 'chunk_size': 7, 'batch_size': 3}
+
+    def generate(self, **options):
+        call_command(
+            'generate_dataset', **{**self.options, **options},
+            stdout=StringIO()
+        )
+
+    def test_requires_catalog(self):
+        with self.assertRaises(CommandError):
+            self.generate()
+
+    def test_generate(self):
+        for index in range(3):
+            Tag.objects.create(name=f'Тег {index}', slug=f'tag{index}')
+        for index in range(20):
+            Ingredient.objects.create(
+                name=f'Ингредиент {index}', measurement_unit='г'
+            )
+        self.generate()
+        self.assertEqual(
+            User.objects.filter(username__startswith='synthetic').count(), 5
+        )
+        self.assertEqual(Recipe.objects.count(), 20)
+        for recipe in Recipe.objects.prefetch_related('tags'):
+            with self.subTest(recipe=recipe.id):
+                self.assertEqual(
+                    recipe.tags_mask,
+                    sum(tag.mask for tag in recipe.tags.all())
+                )
+                self.assertEqual(
+                    recipe.favorites_count,
+                    Favorite.objects.filter(recipe=recipe).count()
+                )
+        self.assertTrue(Favorite.objects.exists())
+        self.assertFalse(Subscription.objects.filter(
+            user=F('subscription')
+        ).exists())
+        with self.assertRaises(CommandError):
+            self.generate()
+        self.generate(prefix='more', users=2)
+        self.assertEqual(Recipe.objects.count(), 40)
+
+
+class MetricsTest(TestCase):
+    """Метрики маршрутов и защищённая выдача для Prometheus."""
+
+    @staticmethod
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_route_metrics(self):
+        labels = {'route': 'TagsViewSet.list', 'method': 'GET'}
+        requests = self.sample(
+            'foodgram_requests_total', status='200', **labels
+        )
+        queries = self.sample('foodgram_request_sql_queries_sum', **labels)
+        observed = self.sample('foodgram_request_sql_queries_count', **labels)
+        with self.assertNumQueries(1):
+            APIClient().get('/api/tags/')
+        self.assertEqual(self.sample(
+            'foodgram_requests_total', status='200', **labels
+        ) - requests, 1)
+        self.assertEqual(
+            self.sample('foodgram_request_sql_queries_sum', **labels)
+            - queries, 1
+        )
+        self.assertEqual(
+            self.sample('foodgram_request_sql_queries_count', **labels)
+            - observed, 1
+        )
+
+    def test_unmatched(self):
+        labels = {'route': 'unmatched', 'method': 'GET', 'status': '404'}
+        requests = self.sample('foodgram_requests_total', **labels)
+        APIClient().get('/no-such-page/')
+        self.assertEqual(
+            self.sample('foodgram_requests_total', **labels) - requests, 1
+        )
+
+    def test_endpoint(self):
+        client = APIClient()
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(client.get('/metrics').status_code, 404)
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(client.get('/metrics').status_code, 401)
+            response = client.get(
+                '/metrics', HTTP_AUTHORIZATION='Bearer secret'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(
+                b'foodgram_request_duration_seconds', response.content
+            )
+
+
+@override_settings(CACHES=TEMP_CACHES)
+class TokenCacheTest(TestCase):
+    """Токены берутся из кэша и забываются при выходе и смене пользователя."""
+
+    def setUp(self):
+        tokens.clear()
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='pass'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def token_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/users/me/')
+        return response, sum(
+            'authtoken_token' in query['sql'] for query in queries
+        )
+
+    def test_cached(self):
+        self.assertEqual(self.token_queries()[1], 1)
+        response, queries = self.token_queries()
+        self.assertEqual(queries, 0)
+        self.assertEqual(response.data['username'], 'user')
+
+    def test_user_saved(self):
+        self.token_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Анна'
+            self.user.save()
+        response, queries = self.token_queries()
+        self.assertEqual(queries, 1)
+        self.assertEqual(response.data['first_name'], 'Анна')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.token_queries()[0].status_code, 401)
+
+    def test_logout(self):
+        self.token_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.token_queries()[0].status_code, 401)
@@ -0,0 +1,76 @@
+from functools import cached_property
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, IntegerField, Max, Sum, Value
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription
+
+User = get_user_model()
+
+
+class ViewerRelations:
+    """Избранное, покупки и подписки пользователя для объектов ответа."""
+
+    def __init__(self, user, objects=()):
+        self.user = user
+        self.recipe_ids = set()
+        self.user_ids = set()
+        for obj in objects:
+            if isinstance(obj, Recipe):
+                self.recipe_ids.add(obj.id)
+                self.user_ids.add(obj.author_id)
+            elif isinstance(obj, User):
+                self.user_ids.add(obj.id)
+
+    def _load(self, queryset, field, ids):
+        if not self.user.is_authenticated or not ids:
+            return set()
+        return set(
+            queryset.filter(
+                user=self.user, **{f'{field}__in': ids}
+            ).values_list(field, flat=True)
+        )
+
+    @cached_property
+    def favorited(self):
+        return self._load(Favorite.objects, 'recipe_id', self.recipe_ids)
+
+    @cached_property
+    def in_shopping_cart(self):
+        return self._load(ShoppingCart.objects, 'recipe_id', self.recipe_ids)
+
+    @cached_property
+    def subscribed(self):
+        return self._load(
+            Subscription.objects, 'subscription_id', self.user_ids
+        )
+
+    def is_favorited(self, recipe):
+        return recipe.id in self.favorited
+
+    def is_in_shopping_cart(self, recipe):
+        return recipe.id in self.in_shopping_cart
+
+    def is_subscribed(self, user):
+        return user.id in self.subscribed
+
+
+def viewer_version(user):
+    """Версия избранного, покупок и подписок пользователя одним запросом."""
+    if not user.is_authenticated:
+        return ()
+    queries = [
+        queryset.filter(user=user).order_by().values('user').annotate(
+            kind=Value(kind, output_field=IntegerField()),
+            count=Count('id'),
+            last=Max('id'),
+            total=Sum(field)
+        ).values_list('kind', 'count', 'last', 'total')
+        for kind, (queryset, field) in enumerate((
+            (Favorite.objects, 'recipe_id'),
+            (ShoppingCart.objects, 'recipe_id'),
+            (Subscription.objects, 'subscription_id'),
+        ))
+    ]
+    return tuple(sorted(queries[0].union(*queries[1:], all=True)))
@@ -1,30 +1,35 @@
 import io
 
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import F
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import FileResponse, HttpResponseRedirect
+from django.http import FileResponse, Http404, HttpResponseRedirect
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet as DjoserUserViewset
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
-from reportlab.rl_config import defaultPageSize
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 
-from api.filters import RecipeFilter, IngredientFilter
+from api.filters import RecipeFilter
+from api.parsers import (FormParser, ImageUploadParser, JSONParser,
+                         MultiPartParser)
 from api.permissions import IsAdminOrOwnerOrReadOnly
 from api.serializers import (AvatarSerializer, TagSerializer,
-                             IngredientSerializer, RecipeSerializer,
+                             IngredientSerializer, RecipeListSerializer,
+                             RecipeSerializer,
                              UserSubscriptionsSerializer, SubscribeSerializer,
                              FavoriteSerializer, CartSerializer)
-from api.viewsets import (TagsIngredientsMixViewSet, ListViewSet)
+from api.shopping_cart import render_shopping_cart
+from api.viewsets import (ListViewSet, ReplicaReadMixin, ResponseCacheMixin,
+                          TagsIngredientsMixViewSet, ViewerRelationsMixin)
+from foodgram_backend.response_cache import recipe_responses
+from recipes.ingredient_catalog import ingredient_catalog
 from recipes.models import (Tag, Ingredient, Recipe, Favorite, ShoppingCart,
-                            RecipeIngredients)
+                            ShoppingListItem)
+from recipes.short_links import get_short_link, resolve_short_link
 from users.models import Subscription
 
 User = get_user_model()
@@ -33,11 +38,17 @@ User = get_user_model()
 class AvatarView(APIView):
     serializer_class = AvatarSerializer
     permission_classes = (IsAuthenticated,)
+    parser_classes = (
+        JSONParser, FormParser, MultiPartParser, ImageUploadParser
+    )
 
     def put(self, request):
+        data = request.data
+        if 'file' in request.FILES:
+            data = {'avatar': request.FILES['file']}
         serializer = AvatarSerializer(
             request.user,
-            data=request.data,
+            data=data,
             partial=True,
             context={'request': request}
         )
@@ -60,8 +71,9 @@ class AvatarView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class UserViewSet(DjoserUserViewset):
+class UserViewSet(ReplicaReadMixin, ViewerRelationsMixin, DjoserUserViewset):
     http_method_names = ('get', 'post', 'delete')
+    replica_actions = ('list',)
 
     @action(detail=True, methods=['post'],
             permission_classes=[IsAuthenticated])
@@ -99,15 +111,12 @@ class UserViewSet(DjoserUserViewset):
 class SubscriptionListViewSet(ListViewSet):
     serializer_class = UserSubscriptionsSerializer
     permission_classes = (IsAuthenticated,)
+    cursor_ordering = ('username', 'id')
 
     def get_queryset(self):
-        subscriptions_list = self.request.user.subscriptions.values_list(
-            'subscription', flat=True
-        )
-        queryset = User.objects.filter(
-            id__in=subscriptions_list
-        )
-        return queryset
+        return User.objects.filter(
+            subscribers__user=self.request.user
+        ).order_by('username', 'id')
 
 
 class TagsViewSet(TagsIngredientsMixViewSet):
@@ -116,29 +125,60 @@ class TagsViewSet(TagsIngredientsMixViewSet):
     pagination_class = None
 
 
-class IngredientViewSet(TagsIngredientsMixViewSet):
+class IngredientViewSet(ReplicaReadMixin, TagsIngredientsMixViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = (IngredientFilter,)
-    search_fields = ('^name',)
+
+    def list(self, request, *args, **kwargs):
+        return Response(
+            ingredient_catalog.search(request.query_params.get('name', ''))
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            ingredient = ingredient_catalog.get(int(kwargs['pk']))
+        except ValueError:
+            ingredient = None
+        if ingredient is None:
+            raise Http404
+        return Response(ingredient)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ReplicaReadMixin, ResponseCacheMixin, ViewerRelationsMixin,
+    viewsets.ModelViewSet
+):
     queryset = Recipe.objects.all()
+    response_cache = recipe_responses
     serializer_class = RecipeSerializer
     permission_classes = (IsAdminOrOwnerOrReadOnly,)
     http_method_names = ('get', 'post', 'patch', 'delete')
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve'):
+            return Recipe.objects.with_related()
+        return super().get_queryset()
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve'):
+            return RecipeListSerializer
+        return super().get_serializer_class()
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
     @action(detail=True, methods=['get'], url_name='get-link',
             url_path='get-link')
     def getlink(self, request, pk=None):
-        hash = get_object_or_404(Recipe, pk=pk).hash
+        try:
+            hash = get_short_link(int(pk))
+        except ValueError:
+            hash = None
+        if hash is None:
+            raise Http404
         response = {
             'short-link': f'http://{request.META["HTTP_HOST"]}/s/{hash}/'
         }
@@ -181,6 +221,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'],
             permission_classes=[IsAuthenticated])
+    @transaction.atomic
     def shopping_cart(self, request, pk=None):
         recipe = get_object_or_404(Recipe, pk=pk)
         serializer = CartSerializer(
@@ -197,6 +238,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
     @shopping_cart.mapping.delete
+    @transaction.atomic
     def shopping_cart_delete(self, request, pk=None):
         cart_recipe = get_object_or_404(
             Recipe, pk=pk
@@ -214,44 +256,23 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'],
             permission_classes=[IsAuthenticated])
     def download_shopping_cart(self, request):
-        PAGE_HEIGHT_DECREMENT = 20
-        current_height = defaultPageSize[1] - PAGE_HEIGHT_DECREMENT
-        buffer = io.BytesIO()
-        pdf = canvas.Canvas(buffer)
-        pdfmetrics.registerFont(
-            TTFont('DejaVuSerif', 'DejaVuSerif.ttf', 'UTF-8')
-        )
-        pdf.setFont('DejaVuSerif', 14)
-        ingredients = RecipeIngredients.objects.filter(
-            recipe__recipes_shoppingcart__user=request.user
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user
         ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(sum=Sum('amount'))
-        for ingredient in ingredients:
-            data = (
-                f'{ingredient["ingredient__name"]} - {ingredient["sum"]} '
-                f'{ingredient["ingredient__measurement_unit"]}'
-            )
-            current_height -= PAGE_HEIGHT_DECREMENT
-            pdf.drawString(
-                40,
-                current_height,
-                data.encode('utf-8')
-            )
-        pdf.showPage()
-        pdf.save()
-        buffer.seek(0)
-
+            'ingredient__name', 'ingredient__measurement_unit',
+            sum=F('amount')
+        ).order_by('ingredient__name')
         return FileResponse(
-            buffer, as_attachment=True, filename='shopping_cart.pdf'
+            io.BytesIO(render_shopping_cart(ingredients)),
+            as_attachment=True,
+            filename='shopping_cart.pdf'
         )
 
 
 def short_link_redirect(request, hash):
-    recipe_id = get_object_or_404(
-        Recipe,
-        hash=hash
-    ).id
+    recipe_id = resolve_short_link(hash)
+    if recipe_id is None:
+        raise Http404
     return HttpResponseRedirect(
         request.build_absolute_uri(f'/recipes/{recipe_id}/')
     )
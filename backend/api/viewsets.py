@@ -1,4 +1,154 @@
-from rest_framework import mixins, viewsets
+from contextlib import nullcontext
+from hashlib import sha256
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework import mixins, status, viewsets
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from api.viewer import ViewerRelations, viewer_version
+from foodgram_backend.db_router import (choose_replica, pinned_to_primary,
+                                        read_replica, use_primary)
+
+
+class ReplicaReadMixin:
+    """Чтение из реплики для безопасных запросов."""
+
+    replica_actions = None
+
+    def dispatch(self, request, *args, **kwargs):
+        with use_primary():
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            settings.DATABASE_REPLICAS
+            and request.method in SAFE_METHODS
+            and (
+                self.replica_actions is None
+                or self.action in self.replica_actions
+            )
+            and not pinned_to_primary(request.user)
+        ):
+            read_replica.set(choose_replica())
+
+
+class ViewerRelationsMixin:
+
+    def get_serializer(self, *args, **kwargs):
+        if args and self.request.method in SAFE_METHODS:
+            objects = args[0] if kwargs.get('many') else (args[0],)
+            kwargs.setdefault('context', self.get_serializer_context())
+            kwargs['context']['viewer'] = ViewerRelations(
+                self.request.user, objects
+            )
+        return super().get_serializer(*args, **kwargs)
+
+
+class ConditionalGetMixin:
+    """ETag и Last-Modified для list и retrieve."""
+
+    response_cache = None
+    updated_field = 'updated_at'
+
+    def make_validators(self, version, last_modified):
+        user = self.request.user
+        etag = sha256(repr(
+            (user.id, version, viewer_version(user))
+        ).encode('utf-8')).hexdigest()[:32]
+        return f'W/"{etag}"', last_modified
+
+    def get_list_validators(self):
+        # Версия кэша ответов меняется при любом изменении рецептов,
+        # так что списку не нужен отдельный проход по таблице.
+        version = self.response_cache.version()
+        return self.make_validators(version, version // 10 ** 9)
+
+    def get_detail_validators(self, lookup):
+        updated = self.queryset.filter(**lookup).values_list(
+            self.updated_field, flat=True
+        ).first()
+        if updated is None:
+            return None, None
+        return self.make_validators(
+            (lookup, updated.isoformat()), int(updated.timestamp())
+        )
+
+    def conditional_response(self, validators, respond, *args, **kwargs):
+        self.validators = etag, last_modified = validators
+        if etag is None:
+            return respond(self.request, *args, **kwargs)
+        # Last-Modified не учитывает удаления и связи пользователя.
+        trusted_last_modified = (
+            last_modified
+            if self.detail and not self.request.user.is_authenticated
+            else None
+        )
+        response = get_conditional_response(
+            self.request, etag=etag, last_modified=trusted_last_modified
+        )
+        if response is None:
+            response = respond(self.request, *args, **kwargs)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.get_list_validators(), super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            validators = self.get_detail_validators(
+                {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError):
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(
+            validators, super().retrieve, *args, **kwargs
+        )
+
+
+class ResponseCacheMixin(ConditionalGetMixin):
+    """Кэш list и retrieve для анонимных пользователей."""
+
+    def cached_response(self, respond, *args, **kwargs):
+        if self.request.user.is_authenticated:
+            return respond(self.request, *args, **kwargs)
+        key = self.response_cache.make_key(self.request)
+        entry = self.response_cache.get(key)
+        if entry is not None:
+            data, validators = entry
+            response = self.conditional_response(
+                validators, lambda request, *args, **kwargs: Response(data)
+            )
+            response['X-Cache'] = 'HIT'
+            return response
+        # Сразу после изменений кэш заполняется из основной базы:
+        # отставание реплики закрепилось бы в нём до следующего сброса.
+        with (
+            use_primary()
+            if self.response_cache.changed_within(
+                settings.DATABASE_STICKINESS
+            ) else nullcontext()
+        ):
+            response = respond(self.request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            self.response_cache.set(key, (response.data, self.validators))
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, *args, **kwargs)
 
 
 class TagsIngredientsMixViewSet(
@@ -1,7 +1,32 @@
+import asyncio
 import os
 
+from asgiref.sync import ThreadSensitiveContext
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+
+class ConcurrentRequests:
+    """Отдельный поток для синхронных view каждого HTTP-запроса."""
+
+    def __init__(self, application, limit):
+        self.application = application
+        self.limit = limit
+        self.slots = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.application(scope, receive, send)
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.limit)
+        async with self.slots, ThreadSensitiveContext():
+            await self.application(scope, receive, send)
+
+
+application = ConcurrentRequests(
+    django_application, settings.ASGI_MAX_CONCURRENT_REQUESTS
+)
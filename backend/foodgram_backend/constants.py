@@ -1,6 +1,7 @@
 USER_TEXTFIELD_MAX_LENGTH = 150
 
 TAG_MAX_LENGTH = 32
+TAG_MASK_BITS = 63
 
 INGREDIENT_NAME_MAX_LENGTH = 128
 
@@ -17,3 +18,11 @@ MIN_INGREDIENT_VALUE = 1
 MAX_INGREDIENT_VALUE = 32000
 
 SHORT_LINK_LENGTH = 128
+
+SHORT_LINK_ALPHABET = (
+    'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+)
+
+SHORT_LINK_MIN_LENGTH = 5
+
+SHORT_LINK_ATTEMPTS_PER_LENGTH = 3
@@ -0,0 +1,25 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+
+class CountersMixin:
+    """Счётчики меняются только атомарным increment, а не через save."""
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        return super().save(*args, **kwargs)
+
+    @classmethod
+    def increment(cls, pk, field, delta=1):
+        cls._default_manager.filter(pk=pk).update(
+            **{field: Greatest(F(field) + delta, 0)}
+        )
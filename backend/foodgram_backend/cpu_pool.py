@@ -0,0 +1,29 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from threading import BoundedSemaphore, Lock
+
+from django.conf import settings
+
+_executor = None
+_executor_lock = Lock()
+_slots = None
+
+
+def get_executor():
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.CPU_POOL_WORKERS,
+                mp_context=get_context('spawn')
+            )
+            _slots = BoundedSemaphore(
+                settings.CPU_POOL_WORKERS + settings.CPU_POOL_QUEUE_SIZE
+            )
+    return _executor
+
+
+def run_in_pool(function, *args):
+    executor = get_executor()
+    with _slots:
+        return executor.submit(function, *args).result()
@@ -0,0 +1,102 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import monotonic
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import request_started
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.dispatch import receiver
+from rest_framework.permissions import SAFE_METHODS
+
+read_replica = ContextVar('read_replica', default=None)
+_unavailable = {}
+
+
+def sticky_key(user_id):
+    return f'db_primary:{user_id}'
+
+
+def pin_to_primary(user):
+    caches[settings.DATABASE_STICKINESS_CACHE].set(
+        sticky_key(user.id), True, settings.DATABASE_STICKINESS
+    )
+
+
+def pinned_to_primary(user):
+    return user.is_authenticated and caches[
+        settings.DATABASE_STICKINESS_CACHE
+    ].get(sticky_key(user.id)) is not None
+
+
+def choose_replica():
+    now = monotonic()
+    replicas = [
+        alias for alias in settings.DATABASE_REPLICAS
+        if _unavailable.get(alias, 0) <= now
+    ]
+    random.shuffle(replicas)
+    for alias in replicas:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            _unavailable[alias] = now + settings.DATABASE_REPLICA_RETRY
+            continue
+        return alias
+    return None
+
+
+@contextmanager
+def use_primary():
+    token = read_replica.set(None)
+    try:
+        yield
+    finally:
+        read_replica.reset(token)
+
+
+class ReplicaRouter:
+    """Чтение из реплики, если его разрешил текущий запрос."""
+
+    def db_for_read(self, model, **hints):
+        alias = read_replica.get()
+        if alias and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryAfterWriteMiddleware:
+    """Закрепляет пользователя за основной базой после его записи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            settings.DATABASE_REPLICAS
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and request.user.is_authenticated
+        ):
+            pin_to_primary(request.user)
+        return response
+
+
+@receiver(request_started)
+def check_connections(**kwargs):
+    if not settings.DATABASE_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
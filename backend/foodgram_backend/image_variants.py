@@ -0,0 +1,101 @@
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image
+
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS,
+                mp_context=get_context('spawn')
+            )
+    return _executor
+
+
+def variant_name(name, variant, format):
+    return os.path.join(
+        'variants', variant, f'{os.path.splitext(name)[0]}.{format}'
+    )
+
+
+def render_variants(name, variants):
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    for variant, size in variants.items():
+        resized = image.copy()
+        resized.thumbnail((size, size))
+        for format, pillow_format in FORMATS.items():
+            converted = resized
+            if pillow_format == 'JPEG' and resized.mode == 'RGBA':
+                converted = Image.new('RGB', resized.size, 'white')
+                converted.paste(resized, mask=resized.getchannel('A'))
+            buffer = io.BytesIO()
+            converted.save(buffer, pillow_format, quality=85)
+            target = variant_name(name, variant, format)
+            default_storage.delete(target)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+    return name
+
+
+def is_new_upload(file):
+    return bool(file) and not file._committed
+
+
+def log_failure(name, future):
+    if future.cancelled() or future.exception() is None:
+        return
+    logger.error(
+        'Не удалось подготовить варианты изображения %s', name,
+        exc_info=future.exception()
+    )
+
+
+def schedule_variants(file, kind):
+    name = file.name
+    variants = settings.IMAGE_VARIANTS[kind]
+    transaction.on_commit(
+        lambda: get_executor().submit(
+            render_variants, name, variants
+        ).add_done_callback(partial(log_failure, name))
+    )
+
+
+def variant_urls(file, kind, request=None):
+    if not file:
+        return None
+    urls = {}
+    for variant in settings.IMAGE_VARIANTS[kind]:
+        urls[variant] = {}
+        for format in FORMATS:
+            # Пока вариант не готов или не удался, отдаём оригинал.
+            name = variant_name(file.name, variant, format)
+            url = (
+                default_storage.url(name) if default_storage.exists(name)
+                else file.url
+            )
+            urls[variant][format] = (
+                request.build_absolute_uri(url) if request else url
+            )
+    return urls
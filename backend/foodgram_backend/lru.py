@@ -0,0 +1,68 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic, time_ns
+
+from django.core.cache import caches
+from django.db import transaction
+
+from foodgram_backend.metrics import CACHE_REQUESTS
+
+MISSING = object()
+
+
+class LRUCache:
+    """Ограниченный по размеру кэш процесса со сроком жизни записей."""
+
+    def __init__(self, name, max_size, ttl, version_alias=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version_alias = version_alias
+        self.version_key = f'lru:{name}:version'
+        self.hits = CACHE_REQUESTS.labels(name, 'hit')
+        self.misses = CACHE_REQUESTS.labels(name, 'miss')
+        self._data = OrderedDict()
+        self._lock = Lock()
+        self._version = None
+
+    def version(self):
+        if self.version_alias is None:
+            return None
+        return caches[self.version_alias].get(self.version_key)
+
+    def get(self, key):
+        # Удаление в другом процессе меняет общую версию,
+        # и тогда свои записи сбрасываются целиком.
+        version = self.version()
+        with self._lock:
+            if version != self._version:
+                self._data.clear()
+                self._version = version
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > monotonic():
+                self._data.move_to_end(key)
+                self.hits.inc()
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses.inc()
+            return MISSING
+
+    def set(self, key, value, ttl=None):
+        expires = monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+        if self.version_alias is not None:
+            transaction.on_commit(lambda: caches[self.version_alias].set(
+                self.version_key, time_ns(), None
+            ))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
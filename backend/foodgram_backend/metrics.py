@@ -0,0 +1,140 @@
+import os
+from contextlib import ExitStack
+from hmac import compare_digest
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+REQUESTS = Counter(
+    'foodgram_requests_total', 'Запросы по маршрутам и статусам',
+    ('route', 'method', 'status')
+)
+REQUEST_DURATION = Histogram(
+    'foodgram_request_duration_seconds', 'Время обработки запроса',
+    ('route', 'method')
+)
+SQL_QUERIES = Histogram(
+    'foodgram_request_sql_queries', 'SQL-запросов на один запрос',
+    ('route', 'method'),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200, float('inf'))
+)
+SQL_DURATION = Histogram(
+    'foodgram_request_sql_seconds', 'Время SQL-запросов одного запроса',
+    ('route', 'method')
+)
+RESPONSE_SIZE = Histogram(
+    'foodgram_response_size_bytes', 'Размер тела ответа',
+    ('route', 'method'),
+    buckets=tuple(256 * 4 ** power for power in range(9)) + (float('inf'),)
+)
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests_total', 'Обращения к кэшам по результату',
+    ('cache', 'result')
+)
+ROUTE_METRICS = (REQUEST_DURATION, SQL_QUERIES, SQL_DURATION, RESPONSE_SIZE)
+
+_route_metrics = {}
+
+
+def route_metrics(route, method):
+    metrics = _route_metrics.get((route, method))
+    if metrics is None:
+        metrics = _route_metrics[route, method] = tuple(
+            metric.labels(route, method) for metric in ROUTE_METRICS
+        )
+    return metrics
+
+
+class QueryTimer:
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += perf_counter() - started
+
+
+def route_name(request):
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched'
+    if match.app_name == 'admin':
+        return 'admin'
+    view = match.func
+    view_class = getattr(view, 'cls', getattr(view, 'view_class', None))
+    if view_class is None:
+        return view.__name__
+    actions = getattr(view, 'actions', None)
+    if actions:
+        method = request.method.lower()
+        return f'{view_class.__name__}.{actions.get(method, method)}'
+    return view_class.__name__
+
+
+def response_size(response):
+    if not response.streaming:
+        return len(response.content)
+    if response.has_header('Content-Length'):
+        return int(response['Content-Length'])
+    return None
+
+
+class MetricsMiddleware:
+    """Время, SQL-запросы и размер ответа по маршрутам для Prometheus."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = perf_counter() - started
+        route = route_name(request)
+        method = request.method if request.method in METHODS else 'other'
+        REQUESTS.labels(route, method, response.status_code).inc()
+        request_duration, sql_queries, sql_duration, sizes = route_metrics(
+            route, method
+        )
+        request_duration.observe(duration)
+        sql_queries.observe(timer.count)
+        sql_duration.observe(timer.duration)
+        size = response_size(response)
+        if size is not None:
+            sizes.observe(size)
+        return response
+
+
+def metrics(request):
+    if not settings.METRICS_TOKEN:
+        raise Http404
+    if not compare_digest(
+        request.headers.get('Authorization', '').encode(),
+        f'Bearer {settings.METRICS_TOKEN}'.encode()
+    ):
+        return HttpResponse(
+            status=401, headers={'WWW-Authenticate': 'Bearer'}
+        )
+    registry = REGISTRY
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(
+        generate_latest(registry), content_type=CONTENT_TYPE_LATEST
+    )
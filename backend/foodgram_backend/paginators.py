@@ -0,0 +1,24 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+EXACT_COUNT_LIMIT = 10_000
+
+
+class EstimatedCountPaginator(Paginator):
+    """Для больших таблиц PostgreSQL берёт число строк из статистики."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    (queryset.model._meta.db_table,)
+                )
+                row = cursor.fetchone()
+            if row and row[0] > EXACT_COUNT_LIMIT:
+                return int(row[0])
+        return super().count
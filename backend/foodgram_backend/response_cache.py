@@ -0,0 +1,66 @@
+from hashlib import sha256
+from time import time_ns
+from urllib.parse import urlencode
+
+from django.core.cache import caches
+from django.db import transaction
+
+from foodgram_backend.metrics import CACHE_REQUESTS
+
+
+class ResponseCache:
+    """Кэш данных ответов, сбрасываемый сменой версии каталога."""
+
+    def __init__(self, alias, namespace, version_alias='shared'):
+        self.alias = alias
+        self.version_alias = version_alias
+        self.namespace = namespace
+        self.version_key = f'{namespace}:version'
+        self.hits = CACHE_REQUESTS.labels(alias, 'hit')
+        self.misses = CACHE_REQUESTS.labels(alias, 'miss')
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def version_cache(self):
+        # Версия общая для всех процессов узла, включая команды manage.py.
+        return caches[self.version_alias]
+
+    def version(self):
+        return self.version_cache.get_or_set(self.version_key, time_ns, None)
+
+    def bump(self):
+        # Новая версия делает недоступными все прежние записи,
+        # поэтому после вытеснения ключа версии устаревших ответов нет.
+        transaction.on_commit(
+            lambda: self.version_cache.set(self.version_key, time_ns(), None)
+        )
+
+    def changed_within(self, seconds):
+        return time_ns() - self.version() < seconds * 10 ** 9
+
+    def make_key(self, request):
+        query = urlencode(sorted(
+            (key, value)
+            for key, values in request.GET.lists()
+            for value in values if value != ''
+        ))
+        url = f'{request.scheme}://{request.get_host()}{request.path}?{query}'
+        return '{}:{}:{}'.format(
+            self.namespace,
+            self.version(),
+            sha256(url.encode('utf-8')).hexdigest()
+        )
+
+    def get(self, key):
+        entry = self.cache.get(key)
+        (self.misses if entry is None else self.hits).inc()
+        return entry
+
+    def set(self, key, entry):
+        self.cache.set(key, entry)
+
+
+recipe_responses = ResponseCache('responses', 'recipes')
@@ -28,11 +28,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram_backend.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'foodgram_backend.db_router.PrimaryAfterWriteMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -76,6 +78,30 @@ else:
         }
     }
 
+DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv(
+    'DB_CONN_MAX_AGE', 0 if os.getenv('SERVER_MODE') == 'asgi' else 60
+))
+DATABASE_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+
+# Реплики: для PostgreSQL через запятую host[:port], для SQLite пути.
+DATABASE_REPLICAS = []
+for number, location in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1
+):
+    replica = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    if replica['ENGINE'] == 'django.db.backends.sqlite3':
+        replica['NAME'] = location
+    else:
+        host, _, port = location.partition(':')
+        replica['HOST'], replica['PORT'] = host, port or replica['PORT']
+    DATABASES[f'replica_{number}'] = replica
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['foodgram_backend.db_router.ReplicaRouter']
+DATABASE_REPLICA_RETRY = int(os.getenv('DB_REPLICA_RETRY', 30))
+DATABASE_STICKINESS = int(os.getenv('DB_PRIMARY_STICKINESS', 10))
+DATABASE_STICKINESS_CACHE = os.getenv('DB_STICKINESS_CACHE', 'stickiness')
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -111,6 +137,81 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+MAX_IMAGE_UPLOAD_SIZE = int(
+    os.getenv('MAX_IMAGE_UPLOAD_SIZE', 10 * 1024 * 1024)
+)
+MAX_FORM_FIELDS_SIZE = 256 * 1024
+IMAGE_DECODE_CHUNK_SIZE = 64 * 1024
+
+IMAGE_VARIANTS = {
+    'avatar': {'small': 96},
+    'recipe': {'card': 480, 'detail': 1200},
+}
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
+
+CPU_POOL_WORKERS = int(os.getenv('CPU_POOL_WORKERS', 2))
+CPU_POOL_QUEUE_SIZE = int(os.getenv('CPU_POOL_QUEUE_SIZE', 8))
+ASGI_MAX_CONCURRENT_REQUESTS = int(
+    os.getenv('ASGI_MAX_CONCURRENT_REQUESTS', 32)
+)
+
+SHOPPING_CART_PDF_CACHE_TTL = int(
+    os.getenv('SHOPPING_CART_PDF_CACHE_TTL', 24 * 60 * 60)
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': os.getenv(
+            'SHARED_CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv('SHARED_CACHE_LOCATION', '/tmp/foodgram-cache'),
+    },
+    # Отдельно от версии ответов: вытеснение при переполнении
+    # удаляет случайные записи и не должно задевать её.
+    'stickiness': {
+        'BACKEND': os.getenv(
+            'DB_STICKINESS_CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv(
+            'DB_STICKINESS_CACHE_LOCATION', '/tmp/foodgram-stickiness'
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(
+                os.getenv('DB_STICKINESS_CACHE_MAX_ENTRIES', 100_000)
+            ),
+        },
+    },
+    'responses': {
+        'BACKEND': os.getenv(
+            'RESPONSE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION', 'responses'),
+        'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TTL', 600)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 5000)),
+        },
+    },
+}
+
+INGREDIENT_CATALOG_TTL = int(os.getenv('INGREDIENT_CATALOG_TTL', 300))
+
+SHORT_LINK_CACHE_SIZE = int(os.getenv('SHORT_LINK_CACHE_SIZE', 100_000))
+SHORT_LINK_CACHE_TTL = int(os.getenv('SHORT_LINK_CACHE_TTL', 3600))
+SHORT_LINK_CACHE_NEGATIVE_TTL = int(
+    os.getenv('SHORT_LINK_CACHE_NEGATIVE_TTL', 60)
+)
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10_000))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 30))
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 AUTH_USER_MODEL = 'users.FoodgramUser'
 
 REST_FRAMEWORK = {
@@ -119,7 +220,13 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
+    ],
+
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.JSONParser',
+        'api.parsers.FormParser',
+        'api.parsers.MultiPartParser',
     ],
 
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.LimitPagePagination',
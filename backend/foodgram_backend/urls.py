@@ -2,9 +2,11 @@ from django.contrib import admin
 from django.urls import include, path
 
 from api.views import short_link_redirect
+from foodgram_backend.metrics import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
     path('s/<str:hash>/', short_link_redirect),
+    path('metrics', metrics),
 ]
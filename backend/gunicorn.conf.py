@@ -0,0 +1,20 @@
+import os
+import shutil
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 3))
+
+if os.getenv('SERVER_MODE', 'wsgi') == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    wsgi_app = 'foodgram_backend.asgi:application'
+else:
+    wsgi_app = 'foodgram_backend.wsgi:application'
+
+# Метрики воркеров собираются через файлы в общем каталоге.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/foodgram-metrics')
+
+
+def on_starting(server):
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
@@ -1,7 +1,10 @@
 from django.contrib import admin
 
+from foodgram_backend.paginators import EstimatedCountPaginator
 from recipes.models import (Ingredient, Recipe, RecipeIngredients, Tag,
                             Favorite, ShoppingCart)
+from recipes.search import search_recipes
+from recipes.shopping_lists import rebuild
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -11,7 +14,6 @@ class TagAdmin(admin.ModelAdmin):
         'slug',
     )
     search_fields = ('name',)
-    list_filter = ('name',)
     list_display_links = ('name',)
 
 
@@ -21,44 +23,107 @@ class IngredientAdmin(admin.ModelAdmin):
         'name',
         'measurement_unit',
     )
-    search_fields = ('name',)
-    list_filter = ('name',)
+    search_fields = ('^name',)
     list_display_links = ('name',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class AuthorFilter(admin.SimpleListFilter):
+    """Фильтр по id или нику автора без списка всех авторов."""
+
+    title = 'автору'
+    parameter_name = 'author'
+    template = 'admin/input_filter.html'
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if not value:
+            return queryset
+        if value.isdigit():
+            return queryset.filter(author_id=value)
+        return queryset.filter(author__username=value)
+
+    def choices(self, changelist):
+        yield {
+            'parameter_name': self.parameter_name,
+            'value': self.value() or '',
+            'placeholder': 'id или ник',
+            'reset_query_string': changelist.get_query_string(
+                remove=(self.parameter_name,)
+            ),
+            'query_parts': [
+                (name, value) for name, value in changelist.params.items()
+                if name != self.parameter_name
+            ],
+        }
 
 
 class IngredientInline(admin.StackedInline):
     model = RecipeIngredients
     extra = 0
     min_num = 1
+    autocomplete_fields = ('ingredient',)
 
 
 class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'name',
         'author',
-        'pub_date'
+        'pub_date',
+        'favorites_count',
+        'cart_count'
     )
+    list_select_related = ('author',)
     search_fields = ('name',)
-    list_filter = ('name', 'tags', 'author')
+    list_filter = (AuthorFilter, 'tags')
     list_display_links = ('name',)
-    readonly_fields = ('favorited', 'pub_date')
+    readonly_fields = ('favorites_count', 'cart_count', 'pub_date')
+    autocomplete_fields = ('author', 'tags')
     inlines = (IngredientInline,)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search_recipes(queryset, search_term), False
 
-    def favorited(self, obj):
-        return obj.recipes_favorite.count()
-    favorited.short_description = 'Добавлений в избранное'
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        rebuild(
+            list(
+                form.instance.recipes_shoppingcart.values_list(
+                    'user_id', flat=True
+                )
+            )
+        )
 
 
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
     list_display_links = ('user',)
-    search_fields = ('user',)
+    list_select_related = ('user', 'recipe')
+    search_fields = ('^user__username', '^user__email')
+    autocomplete_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
     list_display_links = ('user',)
-    search_fields = ('user',)
+    list_select_related = ('user', 'recipe')
+    search_fields = ('^user__username', '^user__email')
+    autocomplete_fields = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(Recipe, RecipeAdmin)
@@ -0,0 +1,78 @@
+from bisect import bisect_left
+from threading import Lock
+from time import monotonic, time_ns
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from recipes.models import Ingredient
+
+
+class IngredientCatalog:
+    """Справочник ингредиентов в памяти процесса с поиском по префиксу."""
+
+    def __init__(self, ttl, version_alias='shared'):
+        self.ttl = ttl
+        self.version_alias = version_alias
+        self.version_key = 'ingredient_catalog:version'
+        self._expires = 0
+        self._version = None
+        self._lock = Lock()
+        self._snapshot = ([], [], {})
+
+    def version(self):
+        return caches[self.version_alias].get(self.version_key)
+
+    def load(self):
+        version = self.version()
+        items = sorted(
+            (
+                {'id': id, 'name': name, 'measurement_unit': unit}
+                for id, name, unit in Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit'
+                )
+            ),
+            key=lambda item: (item['name'].lower(), item['id'])
+        )
+        with self._lock:
+            self._snapshot = (
+                items,
+                [item['name'].lower() for item in items],
+                {item['id']: item for item in items}
+            )
+            self._expires = monotonic() + self.ttl
+            self._version = version
+
+    def invalidate(self):
+        # Остальные процессы узла перечитают справочник по смене версии.
+        self._expires = 0
+        transaction.on_commit(lambda: caches[self.version_alias].set(
+            self.version_key, time_ns(), None
+        ))
+
+    def _get_snapshot(self):
+        if self._expires < monotonic() or self.version() != self._version:
+            self.load()
+        return self._snapshot
+
+    def search(self, query=''):
+        items, names, _ = self._get_snapshot()
+        query = query.strip().lower()
+        if not query:
+            return items
+        start = end = bisect_left(names, query)
+        while end < len(names) and names[end].startswith(query):
+            end += 1
+        return items[start:end] + [
+            item for item, name in zip(items, names)
+            if query in name and not name.startswith(query)
+        ]
+
+    def get(self, ingredient_id):
+        # Новые ингредиенты меняют версию справочника, поэтому
+        # неизвестный id не повод перечитывать его.
+        return self._get_snapshot()[2].get(ingredient_id)
+
+
+ingredient_catalog = IngredientCatalog(settings.INGREDIENT_CATALOG_TTL)
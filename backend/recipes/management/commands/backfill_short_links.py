@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.filter(hash='').only('id', 'hash')
+        created = 0
+        for recipe in recipes.iterator(chunk_size=options['batch_size']):
+            recipe.save(update_fields=('hash',))
+            created += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Короткие ссылки созданы: {created}')
+        )
@@ -0,0 +1,51 @@
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+
+    def add_arguments(self, parser):
+        parser.add_argument('--existing', type=int, default=1_000_000)
+        parser.add_argument('--creates', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        author = User.objects.create(
+            username='short-link-benchmark',
+            email='short-link-benchmark@example.com'
+        )
+        taken = set(Recipe.objects.values_list('hash', flat=True))
+        new_hashes = set()
+        while len(new_hashes) < options['existing']:
+            hash = Recipe.generate_hash()
+            if hash not in taken:
+                new_hashes.add(hash)
+        new_hashes = list(new_hashes)
+        taken.clear()
+        for offset in range(0, len(new_hashes), options['batch_size']):
+            Recipe.objects.bulk_create(
+                Recipe(author=author, name='benchmark', text='',
+                       cooking_time=1, hash=hash)
+                for hash in new_hashes[offset:offset + options['batch_size']]
+            )
+        total = Recipe.objects.count()
+        started = perf_counter()
+        for _ in range(options['creates']):
+            Recipe.objects.create(
+                author=author, name='benchmark', text='', cooking_time=1
+            )
+        elapsed = perf_counter() - started
+        transaction.set_rollback(True)
+        self.stdout.write(
+            f'Рецептов в таблице: {total}\n'
+            f'Создано рецептов: {options["creates"]} за {elapsed:.2f} с '
+            f'({options["creates"] / elapsed:.0f} в секунду)'
+        )
@@ -0,0 +1,80 @@
+import random
+from statistics import median
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from recipes.models import Recipe, Tag
+from recipes.tag_masks import filter_by_tags
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1_000_000)
+        parser.add_argument('--repeats', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=6)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def fill(self, tags, options):
+        author = User.objects.create(
+            username='tag-filter-benchmark',
+            email='tag-filter-benchmark@example.com'
+        )
+        rng = random.Random(options['seed'])
+        next_id = (Recipe.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+        Through = Recipe.tags.through
+        batch_size = options['batch_size']
+        for offset in range(0, options['recipes'], batch_size):
+            recipes, links = [], []
+            for recipe_id in range(
+                next_id + offset,
+                next_id + min(offset + batch_size, options['recipes'])
+            ):
+                chosen = rng.sample(tags, rng.randint(1, 3))
+                recipes.append(Recipe(
+                    id=recipe_id, author=author, name='benchmark', text='',
+                    cooking_time=1, hash=f'tag-filter-benchmark-{recipe_id}',
+                    tags_mask=sum(tag.mask for tag in chosen)
+                ))
+                links.extend(
+                    Through(recipe_id=recipe_id, tag_id=tag.id)
+                    for tag in chosen
+                )
+            Recipe.objects.bulk_create(recipes)
+            Through.objects.bulk_create(links)
+
+    def measure(self, queryset, repeats, page_size):
+        timings = []
+        for _ in range(repeats):
+            started = perf_counter()
+            count = queryset.count()
+            page = list(queryset[:page_size])
+            timings.append(perf_counter() - started)
+        return count, len(page), median(timings) * 1000
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        tags = list(Tag.objects.all())
+        self.fill(tags, options)
+        self.stdout.write(f'Рецептов в таблице: {Recipe.objects.count()}')
+        for size in (1, 2, 3):
+            chosen = tags[:size]
+            slugs = [tag.slug for tag in chosen]
+            join = Recipe.objects.filter(tags__slug__in=slugs).distinct()
+            mask = filter_by_tags(Recipe.objects.all(), chosen)
+            for label, queryset in (('join', join), ('mask', mask)):
+                count, page, elapsed = self.measure(
+                    queryset, options['repeats'], options['page_size']
+                )
+                self.stdout.write(
+                    f'{",".join(slugs)} {label}: {count} рецептов, '
+                    f'страница {page}, {elapsed:.1f} мс'
+                )
+        transaction.set_rollback(True)
@@ -0,0 +1,354 @@
+import random
+from bisect import bisect
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import lru_cache
+from itertools import accumulate
+from multiprocessing import get_context
+from time import perf_counter
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError, call_command
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from foodgram_backend import constants
+from foodgram_backend.response_cache import recipe_responses
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCart, Tag)
+from users.models import Subscription
+
+User = get_user_model()
+
+# Большое простое число: умножение на него по модулю n переставляет
+# номера, чтобы популярные авторы и рецепты не шли подряд по id.
+SCATTER = 2_147_483_647
+
+DISHES = (
+    'Суп', 'Салат', 'Каша', 'Пирог', 'Рагу', 'Омлет', 'Паста', 'Плов',
+    'Запеканка', 'Блины', 'Котлеты', 'Суфле', 'Жаркое', 'Борщ', 'Пицца',
+)
+STYLES = (
+    'с курицей', 'с грибами', 'по-деревенски', 'из тыквы', 'с сыром',
+    'с овощами', 'по-итальянски', 'на скорую руку', 'с говядиной',
+    'с лососем', 'по-домашнему', 'с зеленью', 'без глютена', 'с ягодами',
+)
+STEPS = (
+    'Нарежьте овощи небольшими кубиками.',
+    'Разогрейте сковороду и обжарьте всё до золотистой корочки.',
+    'Доведите до кипения и варите на медленном огне.',
+    'Посолите и поперчите по вкусу.',
+    'Выложите в форму и запекайте в духовке.',
+    'Перемешайте и дайте настояться несколько минут.',
+    'Подавайте горячим, посыпав свежей зеленью.',
+)
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Олег', 'Елена', 'Пётр', 'Ольга')
+LAST_NAMES = ('Иванова', 'Петров', 'Смирнова', 'Кузнецов', 'Попова')
+AMOUNTS = (1, 2, 3, 5, 10, 50, 100, 150, 200, 250, 500, 1000)
+
+
+@lru_cache(maxsize=None)
+def cum_weights(size, skew):
+    return list(accumulate(1 / rank ** skew for rank in range(1, size + 1)))
+
+
+def power_law(rng, size, skew):
+    weights = cum_weights(size, skew)
+    rank = bisect(weights, rng.random() * weights[-1])
+    return rank * SCATTER % size
+
+
+def make_hash(recipe_id):
+    alphabet = constants.SHORT_LINK_ALPHABET
+    value = recipe_id * SCATTER % len(alphabet) ** 8
+    return ''.join(
+        alphabet[value // len(alphabet) ** position % len(alphabet)]
+        for position in range(8)
+    )
+
+
+@contextmanager
+def explicit_dates():
+    fields = [
+        Recipe._meta.get_field(name) for name in ('pub_date', 'updated_at')
+    ]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def generate_users(rng, start, size, plan):
+    User.objects.bulk_create(
+        (
+            User(
+                id=user_id,
+                username=f'{plan["prefix"]}{user_id}',
+                email=f'{plan["prefix"]}{user_id}@example.com',
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                password=plan['password'],
+            )
+            for user_id in range(start, start + size)
+        ),
+        batch_size=plan['batch_size']
+    )
+
+
+def generate_recipes(rng, start, size, plan):
+    first_id, total = plan['recipes_from'], plan['recipes']
+    tags, ingredients = plan['tags'], plan['ingredients']
+    recipes, recipe_tags, recipe_ingredients = [], [], []
+    for recipe_id in range(start, start + size):
+        chosen_tags = {
+            tags[power_law(rng, len(tags), plan['skew'])]
+            for _ in range(rng.randint(1, 3))
+        }
+        pub_date = plan['since'] + timedelta(
+            seconds=plan['period'] * (recipe_id - first_id + rng.random())
+            / total
+        )
+        recipes.append(Recipe(
+            id=recipe_id,
+            author_id=plan['users_from'] + power_law(
+                rng, plan['users'], plan['skew']
+            ),
+            name=f'{rng.choice(DISHES)} {rng.choice(STYLES)}',
+            text=' '.join(rng.sample(STEPS, rng.randint(2, len(STEPS)))),
+            cooking_time=min(
+                max(int(rng.lognormvariate(3.4, 0.6)),
+                    constants.MIN_COOKING_TIME),
+                constants.MAX_COOKING_TIME
+            ),
+            pub_date=pub_date,
+            updated_at=pub_date,
+            hash=make_hash(recipe_id),
+            tags_mask=sum(1 << bit for _, bit in chosen_tags),
+        ))
+        recipe_tags.extend(
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for tag_id, _ in chosen_tags
+        )
+        recipe_ingredients.extend(
+            RecipeIngredients(
+                recipe_id=recipe_id, ingredient_id=ingredient_id,
+                amount=rng.choice(AMOUNTS)
+            )
+            for ingredient_id in {
+                ingredients[power_law(rng, len(ingredients), plan['skew'])]
+                for _ in range(rng.randint(3, 12))
+            }
+        )
+    with explicit_dates():
+        Recipe.objects.bulk_create(recipes, batch_size=plan['batch_size'])
+    Recipe.tags.through.objects.bulk_create(
+        recipe_tags, batch_size=plan['batch_size']
+    )
+    RecipeIngredients.objects.bulk_create(
+        recipe_ingredients, batch_size=plan['batch_size']
+    )
+
+
+def user_recipe_pairs(rng, size, plan):
+    return {
+        (
+            plan['users_from'] + rng.randrange(plan['users']),
+            plan['recipes_from'] + power_law(
+                rng, plan['recipes'], plan['skew']
+            ),
+        )
+        for _ in range(size)
+    }
+
+
+def generate_favorites(rng, start, size, plan):
+    Favorite.objects.bulk_create(
+        (
+            Favorite(user_id=user_id, recipe_id=recipe_id)
+            for user_id, recipe_id in user_recipe_pairs(rng, size, plan)
+        ),
+        batch_size=plan['batch_size'], ignore_conflicts=True
+    )
+
+
+def generate_carts(rng, start, size, plan):
+    ShoppingCart.objects.bulk_create(
+        (
+            ShoppingCart(user_id=user_id, recipe_id=recipe_id)
+            for user_id, recipe_id in user_recipe_pairs(rng, size, plan)
+        ),
+        batch_size=plan['batch_size'], ignore_conflicts=True
+    )
+
+
+def generate_subscriptions(rng, start, size, plan):
+    pairs = set()
+    for _ in range(size):
+        user_id = plan['users_from'] + rng.randrange(plan['users'])
+        author_id = plan['users_from'] + power_law(
+            rng, plan['users'], plan['skew']
+        )
+        if user_id != author_id:
+            pairs.add((user_id, author_id))
+    Subscription.objects.bulk_create(
+        (
+            Subscription(user_id=user_id, subscription_id=author_id)
+            for user_id, author_id in pairs
+        ),
+        batch_size=plan['batch_size'], ignore_conflicts=True
+    )
+
+
+GENERATORS = {
+    'users': generate_users,
+    'recipes': generate_recipes,
+    'favorites': generate_favorites,
+    'carts': generate_carts,
+    'subscriptions': generate_subscriptions,
+}
+
+
+def generate_chunk(kind, index, start, size, plan):
+    rng = random.Random(f'{plan["seed"]}:{kind}:{index}')
+    with transaction.atomic():
+        GENERATORS[kind](rng, start, size, plan)
+    return size
+
+
+class Command(BaseCommand):
+    help = 'Генерирует синтетические данные для нагрузочного тестирования'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--recipes', type=int, default=100_000)
+        parser.add_argument('--favorites', type=int, default=1_000_000)
+        parser.add_argument('--carts', type=int, default=100_000)
+        parser.add_argument('--subscriptions', type=int, default=200_000)
+        parser.add_argument(
+            '--skew', type=float, default=0.8,
+            help='Показатель степенного распределения популярности'
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--chunk-size', type=int, default=20_000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='synthetic')
+        parser.add_argument(
+            '--password', default='foodgram',
+            help='Пароль всех сгенерированных пользователей'
+        )
+
+    def make_plan(self, options):
+        tags = list(Tag.objects.order_by('bit').values_list('id', 'bit'))
+        ingredients = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        )
+        if not tags or not ingredients:
+            raise CommandError(
+                'Сначала выполните load_tags и load_ingredients'
+            )
+        if options['users'] < 2:
+            raise CommandError('Нужно хотя бы два пользователя')
+        if User.objects.filter(
+            username__startswith=options['prefix']
+        ).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {options["prefix"]} уже есть, '
+                'укажите другой --prefix'
+            )
+        period = timedelta(days=options['days'])
+        return {
+            'seed': options['seed'],
+            'skew': options['skew'],
+            'prefix': options['prefix'],
+            'password': make_password(options['password']),
+            'batch_size': options['batch_size'],
+            'tags': tags,
+            'ingredients': ingredients,
+            'users': options['users'],
+            'users_from': (
+                User.objects.aggregate(Max('id'))['id__max'] or 0
+            ) + 1,
+            'recipes': options['recipes'],
+            'recipes_from': (
+                Recipe.objects.aggregate(Max('id'))['id__max'] or 0
+            ) + 1,
+            'since': timezone.now() - period,
+            'period': period.total_seconds(),
+        }
+
+    def run_phase(self, executor, kind, start, total, plan, chunk_size):
+        started = perf_counter()
+        chunks = [
+            (kind, index, start + offset, min(chunk_size, total - offset),
+             plan)
+            for index, offset in enumerate(range(0, total, chunk_size))
+        ]
+        if executor is None:
+            for chunk in chunks:
+                generate_chunk(*chunk)
+        else:
+            for future in [
+                executor.submit(generate_chunk, *chunk) for chunk in chunks
+            ]:
+                future.result()
+        self.stdout.write(
+            f'{kind}: {total} за {perf_counter() - started:.1f} с'
+        )
+
+    def reset_sequences(self):
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), (User, Recipe)
+            ):
+                cursor.execute(sql)
+
+    def handle(self, *args, **options):
+        plan = self.make_plan(options)
+        workers = options['workers']
+        if connection.vendor == 'sqlite' and workers > 1:
+            self.stdout.write(self.style.WARNING(
+                'SQLite не поддерживает параллельную запись, '
+                'используется один процесс'
+            ))
+            workers = 1
+        executor = None
+        if workers > 1:
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=get_context('spawn'),
+                initializer=django.setup
+            )
+        started = perf_counter()
+        try:
+            for kind, start in (
+                ('users', plan['users_from']),
+                ('recipes', plan['recipes_from']),
+                ('favorites', 0),
+                ('carts', 0),
+                ('subscriptions', 0),
+            ):
+                self.run_phase(
+                    executor, kind, start, options[kind], plan,
+                    options['chunk_size']
+                )
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        self.reset_sequences()
+        call_command('rebuild_shopping_lists', stdout=self.stdout)
+        call_command('reconcile_counters', stdout=self.stdout)
+        recipe_responses.bump()
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные сгенерированы за {perf_counter() - started:.1f} с'
+        ))
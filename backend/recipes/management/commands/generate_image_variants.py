@@ -0,0 +1,47 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+
+from foodgram_backend.image_variants import render_variants
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.IMAGE_VARIANT_WORKERS
+        )
+
+    def handle(self, *args, **options):
+        images = [
+            (name, settings.IMAGE_VARIANTS['recipe'])
+            for name in Recipe.objects.exclude(image='').exclude(
+                image__isnull=True
+            ).values_list('image', flat=True).iterator()
+        ] + [
+            (name, settings.IMAGE_VARIANTS['avatar'])
+            for name in User.objects.exclude(avatar='').exclude(
+                avatar__isnull=True
+            ).values_list('avatar', flat=True).iterator()
+        ]
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            futures = [
+                executor.submit(render_variants, name, variants)
+                for name, variants in images
+            ]
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    done += 1
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(str(error))
+        self.stdout.write(self.style.SUCCESS(
+            f'Варианты изображений созданы: {done}, ошибок: {failed}'
+        ))
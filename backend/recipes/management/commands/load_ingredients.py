@@ -1,21 +1,117 @@
 import csv
+import io
+import json
+import re
+from itertools import islice
+from pathlib import Path
 
 from django.conf import settings
 from django.core.management import BaseCommand
+from django.db import connection, transaction
 
+from recipes.ingredient_catalog import ingredient_catalog
 from recipes.models import Ingredient
 
+JSON_SEPARATORS = re.compile(r'[\s,\[]*')
+
+
+def iter_json_array(file, chunk_size=64 * 1024):
+    """Элементы JSON-массива по одному, не читая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer, position = '', 0
+    while True:
+        position = JSON_SEPARATORS.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                if position < len(buffer):
+                    raise
+                return
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield item
+
 
 class Command(BaseCommand):
 
-    def handle(self, *args, **kwargs):
-        Ingredient.objects.all().delete()
-        data_path = settings.BASE_DIR
-        with open(f'{data_path}/data/ingredients.csv', 'r',
-                  encoding='utf-8') as file:
-            reader = csv.reader(file)
-            for row in reader:
-                Ingredient.objects.create(
-                    name=row[0], measurement_unit=row[1]
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=Path(settings.BASE_DIR) / 'data' / 'ingredients.csv',
+            help='Файл .csv или .json со списком ингредиентов'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    @staticmethod
+    def read_rows(path):
+        with open(path, 'r', encoding='utf-8') as file:
+            if Path(path).suffix == '.json':
+                for row in iter_json_array(file):
+                    yield row['name'], row['measurement_unit']
+                return
+            for name, measurement_unit, *_ in csv.reader(file):
+                yield name, measurement_unit
+
+    @staticmethod
+    def batches(rows, batch_size):
+        rows = iter(rows)
+        while batch := list(islice(rows, batch_size)):
+            yield batch
+
+    def copy_rows(self, rows, batch_size):
+        table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredients_import '
+                '(name text, measurement_unit text) ON COMMIT DROP'
+            )
+            for batch in self.batches(rows, batch_size):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    'COPY ingredients_import FROM STDIN WITH (FORMAT csv)',
+                    buffer
                 )
-        self.stdout.write(self.style.SUCCESS('Ингредиенты добавлены'))
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM ingredients_import ON CONFLICT DO NOTHING'
+            )
+            inserted = cursor.rowcount
+            cursor.execute('SELECT COUNT(*) FROM ingredients_import')
+            total = cursor.fetchone()[0]
+        return total, inserted
+
+    def bulk_create_rows(self, rows, batch_size):
+        total = 0
+        count_before = Ingredient.objects.count()
+        for batch in self.batches(rows, batch_size):
+            total += len(batch)
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in batch
+                ),
+                ignore_conflicts=True
+            )
+        return total, Ingredient.objects.count() - count_before
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        rows = self.read_rows(options['path'])
+        if connection.vendor == 'postgresql':
+            total, inserted = self.copy_rows(rows, options['batch_size'])
+        else:
+            total, inserted = self.bulk_create_rows(
+                rows, options['batch_size']
+            )
+        transaction.on_commit(ingredient_catalog.invalidate)
+        self.stdout.write(self.style.SUCCESS(
+            f'Ингредиенты загружены: добавлено {inserted}, '
+            f'пропущено {total - inserted}'
+        ))
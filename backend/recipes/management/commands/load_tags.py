@@ -1,12 +1,14 @@
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
 
 from recipes.models import Tag
+from recipes.tag_masks import forget_mask_bits
 
 
 class Command(BaseCommand):
 
+    @transaction.atomic
     def handle(self, *args, **kwargs):
-        Tag.objects.all().delete()
         data = [
             {'name': 'Завтрак', 'slug': 'breakfast'},
             {'name': 'Обед', 'slug': 'lunch'},
@@ -14,6 +16,28 @@ class Command(BaseCommand):
             {'name': 'Праздник', 'slug': 'holiday'},
             {'name': 'Быстро', 'slug': 'fast'}
         ]
+        existing = {tag.slug: tag for tag in Tag.objects.all()}
+        created = [
+            Tag(name=tag['name'], slug=tag['slug'])
+            for tag in data if tag['slug'] not in existing
+        ]
+        free_bits = Tag.free_bits()
+        if len(free_bits) < len(created):
+            raise CommandError('Не хватает свободных битов для новых тегов')
+        for tag, bit in zip(created, free_bits):
+            tag.bit = bit
+        updated = []
         for tag in data:
-            Tag.objects.create(name=tag['name'], slug=tag['slug'])
-        self.stdout.write(self.style.SUCCESS('Теги добавлены'))
+            current = existing.get(tag['slug'])
+            if current and current.name != tag['name']:
+                current.name = tag['name']
+                updated.append(current)
+        Tag.objects.bulk_create(created, ignore_conflicts=True)
+        Tag.objects.bulk_update(updated, ('name',))
+        if created:
+            forget_mask_bits()
+        self.stdout.write(self.style.SUCCESS(
+            f'Теги загружены: добавлено {len(created)}, '
+            f'обновлено {len(updated)}, '
+            f'пропущено {len(data) - len(created) - len(updated)}'
+        ))
@@ -0,0 +1,319 @@
+import json
+import random
+import threading
+from math import ceil
+from time import monotonic, perf_counter
+from urllib.parse import urljoin
+
+import requests
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+MIX = {
+    'recipes': 30,
+    'recipe': 15,
+    'feed': 12,
+    'subscriptions': 5,
+    'favorite': 8,
+    'shopping_cart': 5,
+    'ingredients': 15,
+    'short_link': 8,
+    'download_shopping_cart': 2,
+}
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(timings, percent):
+    return timings[max(ceil(len(timings) * percent / 100) - 1, 0)]
+
+
+class Client:
+
+    def __init__(self, base_url, token, data, rng):
+        self.base_url = base_url
+        self.data = data
+        self.rng = rng
+        self.anonymous = requests.Session()
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f'Token {token}'
+        self.results = []
+
+    def request(self, name, session, method, path, expected, **kwargs):
+        started = perf_counter()
+        try:
+            response = session.request(
+                method, urljoin(self.base_url, path), allow_redirects=False,
+                timeout=60, **kwargs
+            )
+            ok = response.status_code in expected
+        except requests.RequestException:
+            response, ok = None, False
+        self.results.append(
+            (f'{method} {name}', perf_counter() - started, ok)
+        )
+        return response
+
+    def recipe_path(self):
+        return f'/api/recipes/{self.rng.choice(self.data["recipes"])[0]}/'
+
+    def browse(self, name, session, params):
+        response = self.request(
+            name, session, 'GET', '/api/recipes/', (200,), params=params
+        )
+        while (
+            response is not None and response.status_code == 200
+            and response.json()['next'] and self.rng.random() < 0.3
+        ):
+            response = self.request(
+                name, session, 'GET', response.json()['next'], (200,)
+            )
+
+    def recipes(self):
+        tags = self.data['tags']
+        tags = self.rng.sample(tags, self.rng.randint(0, min(2, len(tags))))
+        self.browse('recipes', self.anonymous, {'limit': 6, 'tags': tags})
+
+    def recipe(self):
+        self.request(
+            'recipe', self.anonymous, 'GET', self.recipe_path(), (200,)
+        )
+
+    def feed(self):
+        self.browse('feed', self.session, {'limit': 6})
+
+    def subscriptions(self):
+        self.request(
+            'subscriptions', self.session, 'GET', '/api/users/subscriptions/',
+            (200,), params={'limit': 6, 'recipes_limit': 3}
+        )
+
+    def toggle(self, name):
+        path = f'{self.recipe_path()}{name}/'
+        response = self.request(name, self.session, 'POST', path, (201, 400))
+        self.request(name, self.session, 'DELETE', path, (204,))
+        if response is not None and response.status_code == 400:
+            self.request(name, self.session, 'POST', path, (201,))
+
+    def favorite(self):
+        self.toggle('favorite')
+
+    def shopping_cart(self):
+        self.toggle('shopping_cart')
+
+    def ingredients(self):
+        name = self.rng.choice(self.data['ingredients'])
+        self.request(
+            'ingredients', self.anonymous, 'GET', '/api/ingredients/', (200,),
+            params={'name': name[:self.rng.randint(1, 3)]}
+        )
+
+    def short_link(self):
+        hash = self.rng.choice(self.data['recipes'])[1]
+        self.request(
+            'short_link', self.anonymous, 'GET', f'/s/{hash}/', (302,)
+        )
+
+    def download_shopping_cart(self):
+        self.request(
+            'download_shopping_cart', self.session, 'GET',
+            '/api/recipes/download_shopping_cart/', (200,)
+        )
+
+    def run(self, mix, deadline):
+        names, weights = zip(*mix.items())
+        while monotonic() < deadline:
+            getattr(self, self.rng.choices(names, weights)[0])()
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест API запущенного сервера'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--duration', type=float, default=60)
+        parser.add_argument('--warmup', type=float, default=5)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--mix', action='append', default=[], metavar='ENDPOINT=WEIGHT',
+            help=f'Вес сценария, по умолчанию {MIX}'
+        )
+        parser.add_argument('--save', help='Сохранить результаты в JSON')
+        parser.add_argument(
+            '--baseline', help='Сравнить с ранее сохранёнными результатами'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимое ухудшение p95 и пропускной способности'
+        )
+        parser.add_argument(
+            '--min-delta', type=float, default=5,
+            help='Игнорировать ухудшение p95 меньше стольких миллисекунд'
+        )
+        parser.add_argument(
+            '--min-requests', type=int, default=20,
+            help='Не сравнивать запросы с меньшим числом замеров'
+        )
+
+    def get_mix(self, options):
+        mix = dict(MIX)
+        for item in options['mix']:
+            name, _, weight = item.partition('=')
+            if name not in MIX or not weight.isdigit():
+                raise CommandError(f'Неверный сценарий: {item}')
+            mix[name] = int(weight)
+        mix = {name: weight for name, weight in mix.items() if weight}
+        if not mix:
+            raise CommandError('Все сценарии отключены')
+        return mix
+
+    def get_data(self, concurrency):
+        recipes = list(
+            Recipe.objects.order_by('-pub_date').values_list('id', 'hash')[
+                :10_000
+            ]
+        )
+        users = list(User.objects.filter(is_active=True)[:concurrency])
+        if not recipes or not users:
+            raise CommandError(
+                'Для нагрузочного теста нужны рецепты и пользователи'
+            )
+        return {
+            'recipes': recipes,
+            'tags': list(Tag.objects.values_list('slug', flat=True)),
+            'ingredients': list(
+                Ingredient.objects.values_list('name', flat=True)[:10_000]
+            ),
+            'tokens': [
+                Token.objects.get_or_create(user=user)[0].key
+                for user in users
+            ],
+        }
+
+    def run_clients(self, clients, mix, duration):
+        deadline = monotonic() + duration
+        threads = [
+            threading.Thread(target=client.run, args=(mix, deadline))
+            for client in clients
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def summarize(self, clients, duration):
+        timings, errors = {}, {}
+        for client in clients:
+            for name, elapsed, ok in client.results:
+                timings.setdefault(name, []).append(elapsed * 1000)
+                errors[name] = errors.get(name, 0) + (not ok)
+        report = {}
+        for name, values in sorted(timings.items()):
+            values.sort()
+            report[name] = {
+                'requests': len(values),
+                'errors': errors[name],
+                'rps': len(values) / duration,
+                **{
+                    f'p{percent}': percentile(values, percent)
+                    for percent in PERCENTILES
+                },
+            }
+        return report
+
+    def print_report(self, report):
+        self.stdout.write(
+            f'{"Запрос":36} {"всего":>7} {"ошибок":>7} {"rps":>8} '
+            + ' '.join(f'{f"p{percent}, мс":>9}' for percent in PERCENTILES)
+        )
+        for name, row in report.items():
+            self.stdout.write(
+                f'{name:36} {row["requests"]:7} {row["errors"]:7} '
+                f'{row["rps"]:8.1f} '
+                + ' '.join(
+                    f'{row[f"p{percent}"]:9.1f}' for percent in PERCENTILES
+                )
+            )
+
+    def compare(self, report, baseline, options):
+        regressions = []
+        for name, row in report.items():
+            base = baseline.get(name)
+            if base is None or min(
+                row['requests'], base['requests']
+            ) < options['min_requests']:
+                continue
+            if (
+                row['p95'] > base['p95'] * (1 + options['tolerance'])
+                and row['p95'] - base['p95'] > options['min_delta']
+            ):
+                regressions.append(
+                    f'{name}: p95 {base["p95"]:.1f} -> {row["p95"]:.1f} мс'
+                )
+            if row['rps'] < base['rps'] * (1 - options['tolerance']):
+                regressions.append(
+                    f'{name}: rps {base["rps"]:.1f} -> {row["rps"]:.1f}'
+                )
+            error_rate = row['errors'] / row['requests']
+            base_error_rate = base['errors'] / base['requests']
+            if error_rate > base_error_rate:
+                regressions.append(
+                    f'{name}: ошибок {base_error_rate:.1%} -> {error_rate:.1%}'
+                )
+        return regressions
+
+    def handle(self, *args, **options):
+        mix = self.get_mix(options)
+        data = self.get_data(options['concurrency'])
+        rng = random.Random(options['seed'])
+        clients = [
+            Client(
+                options['url'], data['tokens'][index % len(data['tokens'])],
+                data, random.Random(rng.random())
+            )
+            for index in range(options['concurrency'])
+        ]
+        if options['warmup']:
+            self.run_clients(clients, mix, options['warmup'])
+            for client in clients:
+                client.results.clear()
+        self.run_clients(clients, mix, options['duration'])
+        report = self.summarize(clients, options['duration'])
+        self.print_report(report)
+        total = sum(row['requests'] for row in report.values())
+        self.stdout.write(
+            f'Всего {total} запросов, '
+            f'{total / options["duration"]:.1f} в секунду'
+        )
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'options': {
+                        key: options[key] for key in (
+                            'url', 'duration', 'concurrency', 'seed'
+                        )
+                    },
+                    'mix': mix,
+                    'results': report,
+                }, file, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+            if baseline['mix'] != mix:
+                self.stdout.write(self.style.WARNING(
+                    'Состав нагрузки отличается от базового прогона'
+                ))
+            regressions = self.compare(report, baseline['results'], options)
+            if regressions:
+                raise CommandError(
+                    'Регрессии относительно базового прогона:\n'
+                    + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS(
+                'Регрессий относительно базового прогона нет'
+            ))
@@ -0,0 +1,45 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import ShoppingCart, ShoppingListItem
+from recipes.shopping_lists import live_totals, rebuild, stored_totals
+
+
+class Command(BaseCommand):
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сравнить списки покупок с корзинами'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user_ids = sorted(
+            set(ShoppingCart.objects.values_list('user_id', flat=True))
+            | set(ShoppingListItem.objects.values_list('user_id', flat=True))
+        )
+        mismatched = 0
+        for offset in range(0, len(user_ids), options['batch_size']):
+            batch = user_ids[offset:offset + options['batch_size']]
+            with transaction.atomic():
+                live = live_totals(batch)
+                stored = stored_totals(batch)
+                mismatched += len({
+                    user_id for user_id, ingredient_id
+                    in live.keys() | stored.keys()
+                    if live.get((user_id, ingredient_id))
+                    != stored.get((user_id, ingredient_id))
+                })
+                if not options['verify']:
+                    rebuild(batch)
+        if options['verify']:
+            if mismatched:
+                raise CommandError(
+                    f'Списки покупок расходятся с корзинами: {mismatched}'
+                )
+            self.stdout.write(self.style.SUCCESS('Списки покупок совпадают'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны, исправлено: {mismatched}'
+        ))
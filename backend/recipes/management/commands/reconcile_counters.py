@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription
+
+User = get_user_model()
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'cart_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'subscription'),
+)
+
+
+def related_count(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by().values(field)
+            .annotate(total=Count('pk')).values('total')
+        ),
+        0
+    )
+
+
+class Command(BaseCommand):
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сравнить счётчики с фактическими значениями'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        drifted = 0
+        batch_size = options['batch_size']
+        for model, counter, related, field in COUNTERS:
+            actual = related_count(related, field)
+            ids = list(
+                model.objects.annotate(actual=actual)
+                .exclude(**{counter: F('actual')})
+                .values_list('pk', flat=True)
+            )
+            if ids:
+                self.stdout.write(
+                    f'{model._meta.label}.{counter}: расхождений {len(ids)}'
+                )
+            drifted += len(ids)
+            if options['verify']:
+                continue
+            for offset in range(0, len(ids), batch_size):
+                model.objects.filter(
+                    pk__in=ids[offset:offset + batch_size]
+                ).update(**{counter: actual})
+        if options['verify']:
+            if drifted:
+                raise CommandError(f'Счётчики расходятся: {drifted}')
+            self.stdout.write(self.style.SUCCESS('Счётчики совпадают'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики сверены, исправлено: {drifted}'
+        ))
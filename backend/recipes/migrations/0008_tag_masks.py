@@ -0,0 +1,44 @@
+# Generated by Django 3.2.3 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+def fill_tag_masks(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Tag = apps.get_model('recipes', 'Tag')
+    for bit, tag in enumerate(Tag.objects.order_by('id')):
+        tag.bit = bit
+        tag.save(update_fields=('bit',))
+        Recipe.objects.filter(tags=tag).update(
+            tags_mask=models.F('tags_mask').bitor(1 << bit)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='bit',
+            field=models.PositiveSmallIntegerField(
+                editable=False,
+                null=True,
+                verbose_name='Бит в маске тегов'
+            ),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(
+                db_index=True,
+                default=0,
+                editable=False,
+                verbose_name='Маска тегов'
+            ),
+        ),
+        migrations.RunPython(fill_tag_masks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.3 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_tag_masks'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tag',
+            name='bit',
+            field=models.PositiveSmallIntegerField(
+                editable=False,
+                unique=True,
+                verbose_name='Бит в маске тегов'
+            ),
+        ),
+    ]
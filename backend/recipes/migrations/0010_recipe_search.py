@@ -0,0 +1,81 @@
+# Generated by Django 3.2.3 on 2026-10-18 21:30
+
+from django.db import migrations
+
+FTS_TRIGGERS = {
+    'recipes_recipe_fts_insert': (
+        'AFTER INSERT ON recipes_recipe BEGIN '
+        'INSERT INTO recipes_recipe_fts(rowid, name, text) '
+        'VALUES (new.id, new.name, new.text); END'
+    ),
+    'recipes_recipe_fts_delete': (
+        'AFTER DELETE ON recipes_recipe BEGIN '
+        'INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, '
+        "text) VALUES ('delete', old.id, old.name, old.text); END"
+    ),
+    'recipes_recipe_fts_update': (
+        'AFTER UPDATE OF name, text ON recipes_recipe BEGIN '
+        'INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, '
+        "text) VALUES ('delete', old.id, old.name, old.text); "
+        'INSERT INTO recipes_recipe_fts(rowid, name, text) '
+        'VALUES (new.id, new.name, new.text); END'
+    ),
+}
+
+
+def install(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'ALTER TABLE recipes_recipe ADD COLUMN IF NOT EXISTS '
+                'search_vector tsvector GENERATED ALWAYS AS ('
+                "setweight(to_tsvector('russian', name), 'A') || "
+                "setweight(to_tsvector('russian', text), 'B')) STORED"
+            )
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector '
+                'ON recipes_recipe USING GIN (search_vector)'
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts '
+                "USING fts5(name, text, content='recipes_recipe', "
+                "content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+            for name, body in FTS_TRIGGERS.items():
+                cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+            cursor.execute(
+                'INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rank) '
+                "VALUES ('rank', 'bm25(10.0, 1.0)')"
+            )
+            cursor.execute(
+                'INSERT INTO recipes_recipe_fts(recipes_recipe_fts) '
+                "VALUES ('rebuild')"
+            )
+
+
+def uninstall(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS '
+                'search_vector'
+            )
+        elif connection.vendor == 'sqlite':
+            for name in FTS_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute('DROP TABLE IF EXISTS recipes_recipe_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_alter_tag_bit'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.3 on 2026-10-18 21:50
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def related_count(model, field):
+    return Coalesce(
+        models.Subquery(
+            model.objects.filter(**{field: models.OuterRef('pk')})
+            .order_by().values(field)
+            .annotate(total=models.Count('pk')).values('total')
+        ),
+        0
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    Recipe.objects.update(
+        favorites_count=related_count(Favorite, 'recipe'),
+        cart_count=related_count(ShoppingCart, 'recipe')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='cart_count',
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                verbose_name='Добавлений в список покупок'
+            ),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                verbose_name='Добавлений в избранное'
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
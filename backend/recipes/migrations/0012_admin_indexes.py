@@ -0,0 +1,38 @@
+# Generated by Django 3.2.3 on 2026-10-18 22:10
+
+from django.db import migrations, models
+
+
+def create_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_prefix '
+            'ON recipes_ingredient (UPPER(name) text_pattern_ops)'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'DROP INDEX IF EXISTS recipes_ingredient_name_prefix'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='pub_date',
+            field=models.DateTimeField(
+                auto_now_add=True,
+                db_index=True,
+                verbose_name='Дата публикации'
+            ),
+        ),
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
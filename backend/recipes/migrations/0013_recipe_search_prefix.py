@@ -0,0 +1,46 @@
+# Generated by Django 3.2.3 on 2026-10-18 22:10
+
+from django.db import migrations
+
+
+def rebuild_fts(schema_editor, options):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS recipes_recipe_fts')
+        cursor.execute(
+            'CREATE VIRTUAL TABLE recipes_recipe_fts '
+            "USING fts5(name, text, content='recipes_recipe', "
+            "content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2'{options})"
+        )
+        cursor.execute(
+            'INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rank) '
+            "VALUES ('rank', 'bm25(10.0, 1.0)')"
+        )
+        cursor.execute(
+            'INSERT INTO recipes_recipe_fts(recipes_recipe_fts) '
+            "VALUES ('rebuild')"
+        )
+
+
+def add_prefix_index(apps, schema_editor):
+    # Запросы с * по коротким основам без префиксного индекса
+    # читают списки всех подходящих слов целиком.
+    rebuild_fts(schema_editor, ", prefix='3 4 5 6'")
+
+
+def remove_prefix_index(apps, schema_editor):
+    rebuild_fts(schema_editor, '')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_prefix_index, remove_prefix_index),
+    ]
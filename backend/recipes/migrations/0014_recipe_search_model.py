@@ -0,0 +1,25 @@
+# Generated by Django 3.2.3 on 2026-10-18 22:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_search_prefix'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearch',
+            fields=[
+                ('recipe', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='recipes.recipe')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'recipes_recipe_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -1,10 +1,15 @@
 import random
+from itertools import count
 
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models.functions import RowNumber
+from django.utils import timezone
 
 from foodgram_backend import constants
+from foodgram_backend.counters import CountersMixin
 
 User = get_user_model()
 
@@ -15,6 +20,11 @@ class Tag(models.Model):
         max_length=constants.TAG_MAX_LENGTH
     )
     slug = models.SlugField(max_length=constants.TAG_MAX_LENGTH, unique=True)
+    bit = models.PositiveSmallIntegerField(
+        'Бит в маске тегов',
+        unique=True,
+        editable=False
+    )
 
     class Meta:
         verbose_name = 'Тег'
@@ -24,6 +34,27 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def mask(self):
+        return 1 << self.bit
+
+    @staticmethod
+    def free_bits():
+        return sorted(
+            set(range(constants.TAG_MASK_BITS))
+            - set(Tag.objects.values_list('bit', flat=True))
+        )
+
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            free = self.free_bits()
+            if not free:
+                raise ValidationError(
+                    f'Нельзя создать больше {constants.TAG_MASK_BITS} тегов'
+                )
+            self.bit = free[0]
+        super().save(*args, **kwargs)
+
 
 class Ingredient(models.Model):
     name = models.CharField(
@@ -50,7 +81,57 @@ class Ingredient(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            'tags', 'recipeingredients_set'
+        )
+
+    def minified(self):
+        return self.only('id', 'name', 'image', 'cooking_time')
+
+    def touch(self):
+        return self.update(updated_at=timezone.now())
+
+    def latest_by_author(self, author_ids, limit=None):
+        if not author_ids:
+            return {}
+        recipes = self.filter(author_id__in=author_ids).only(
+            'id', 'author_id', 'name', 'image', 'cooking_time'
+        )
+        if limit is not None and connection.features.supports_over_clause:
+            ranked = recipes.annotate(
+                recipe_rank=models.Window(
+                    expression=RowNumber(),
+                    partition_by=models.F('author_id'),
+                    order_by=(models.F('pub_date').desc(),
+                              models.F('id').desc())
+                )
+            ).values(
+                'id', 'author_id', 'name', 'image', 'cooking_time',
+                'recipe_rank'
+            )
+            sql, params = ranked.query.sql_with_params()
+            recipes = self.raw(
+                'SELECT id, author_id, name, image, cooking_time '
+                f'FROM ({sql}) ranked WHERE recipe_rank <= %s '
+                'ORDER BY author_id, recipe_rank',
+                (*params, limit)
+            )
+        elif limit is not None:
+            recipes = recipes.filter(
+                pk__in=self.filter(
+                    author_id=models.OuterRef('author_id')
+                ).order_by('-pub_date', '-id').values('pk')[:limit]
+            )
+        by_author = {author_id: [] for author_id in author_ids}
+        for recipe in recipes:
+            by_author[recipe.author_id].append(recipe)
+        return by_author
+
+
+class Recipe(CountersMixin, models.Model):
     ingredients = models.ManyToManyField(
         Ingredient,
         through='RecipeIngredients',
@@ -92,13 +173,38 @@ class Recipe(models.Model):
     )
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации',
-        auto_now_add=True
+        auto_now_add=True,
+        db_index=True
+    )
+    tags_mask = models.BigIntegerField(
+        'Маска тегов',
+        default=0,
+        db_index=True,
+        editable=False
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
     )
     hash = models.CharField(
         'Короткая ссылка',
         max_length=constants.SHORT_LINK_LENGTH,
         unique=True
     )
+    favorites_count = models.PositiveIntegerField(
+        'Добавлений в избранное',
+        default=0,
+        editable=False
+    )
+    cart_count = models.PositiveIntegerField(
+        'Добавлений в список покупок',
+        default=0,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    counter_fields = ('favorites_count', 'cart_count')
 
     class Meta:
         verbose_name = 'Рецепт'
@@ -108,21 +214,44 @@ class Recipe(models.Model):
     def __str__(self):
         return self.name
 
-    def generate_hash(self):
-        storage = Recipe.objects.all().values_list(
-            'hash', flat=True
+    @staticmethod
+    def generate_hash(length=constants.SHORT_LINK_MIN_LENGTH):
+        return ''.join(
+            random.choices(constants.SHORT_LINK_ALPHABET, k=length)
         )
-        population = [chr(i) for i in range(97, 122)]
-        population.extend([chr(i) for i in range(65, 90)])
-        hash = ''.join(random.choices(population, k=5))
-        while hash in storage:
-            hash = ''.join(random.choices(population, k=5))
-        return hash
 
     def save(self, *args, **kwargs):
-        if not self.hash:
-            self.hash = self.generate_hash()
-        return super().save(*args, **kwargs)
+        if self.hash:
+            return super().save(*args, **kwargs)
+        for attempt in count():
+            self.hash = self.generate_hash(
+                constants.SHORT_LINK_MIN_LENGTH
+                + attempt // constants.SHORT_LINK_ATTEMPTS_PER_LENGTH
+            )
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if not Recipe.objects.filter(hash=self.hash).exists():
+                    self.hash = ''
+                    raise
+
+
+class RecipeSearch(models.Model):
+    """Строка полнотекстового индекса FTS5 (есть только в SQLite)."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search'
+    )
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'recipes_recipe_fts'
 
 
 class RecipeIngredients(models.Model):
@@ -199,3 +328,27 @@ class ShoppingCart(ShoppingCartFavorite):
                 name='unique_shopping_cart'
             ),
         ]
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE
+    )
+    amount = models.PositiveIntegerField('Количество')
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списка покупок'
+        default_related_name = '%(app_label)s_%(class)s'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            ),
+        ]
+
+    def __str__(self):
+        return self.ingredient.name
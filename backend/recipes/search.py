@@ -0,0 +1,105 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, F, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'recipes_recipe_fts'
+FTS_TRIGGERS = {
+    'recipes_recipe_fts_insert': (
+        'AFTER INSERT ON recipes_recipe BEGIN '
+        f'INSERT INTO {FTS_TABLE}(rowid, name, text) '
+        'VALUES (new.id, new.name, new.text); END'
+    ),
+    'recipes_recipe_fts_delete': (
+        'AFTER DELETE ON recipes_recipe BEGIN '
+        f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text) '
+        "VALUES ('delete', old.id, old.name, old.text); END"
+    ),
+    'recipes_recipe_fts_update': (
+        'AFTER UPDATE OF name, text ON recipes_recipe BEGIN '
+        f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text) '
+        "VALUES ('delete', old.id, old.name, old.text); "
+        f'INSERT INTO {FTS_TABLE}(rowid, name, text) '
+        'VALUES (new.id, new.name, new.text); END'
+    ),
+}
+TSQUERY = "websearch_to_tsquery('russian', %s)"
+RUSSIAN_ENDING = re.compile(
+    r'(иями|ями|ами|ого|его|ому|ему|ыми|ими|ой|ей|ий|ый|ая|яя|ое|ее|ые|ие|'
+    r'ых|их|ым|им|ую|юю|ом|ем|ам|ям|ах|ях|ов|ев|а|я|ы|и|у|ю|е|о|ь)$'
+)
+MIN_STEM_LENGTH = 3
+# Длины префиксного индекса FTS5 из миграции 0013.
+MAX_PREFIX_LENGTH = 6
+
+
+def restore_search_index(connection):
+    """Восстанавливает триггеры FTS5, потерянные при пересоздании таблицы."""
+    if connection.vendor != 'sqlite':
+        return
+    if FTS_TABLE not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            'AND tbl_name = %s', ('recipes_recipe',)
+        )
+        existing = {name for name, in cursor.fetchall()}
+        if existing >= FTS_TRIGGERS.keys():
+            return
+        for name, body in FTS_TRIGGERS.items():
+            cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {body}')
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+
+
+def stem(word):
+    stemmed = RUSSIAN_ENDING.sub('', word)
+    return stemmed if len(stemmed) >= MIN_STEM_LENGTH else word
+
+
+def fts5_query(query):
+    return ' '.join(
+        f'"{stem(word)[:MAX_PREFIX_LENGTH]}"*'
+        for word in re.findall(r'\w+', query.lower())
+    )
+
+
+def postgres_search(queryset, query):
+    return queryset.filter(
+        RawSQL(f'search_vector @@ {TSQUERY}', (query,),
+               output_field=BooleanField())
+    ).annotate(search_rank=RawSQL(
+        f'ts_rank(search_vector, {TSQUERY})', (query,),
+        output_field=FloatField()
+    ))
+
+
+def sqlite_search(queryset, query):
+    match = fts5_query(query)
+    if not match:
+        return queryset.none()
+    # Столбец без имени таблицы: в подзапросе MATCH идёт по его же join.
+    return queryset.filter(
+        RawSQL(f'{FTS_TABLE} MATCH %s', (match,), output_field=BooleanField()),
+        search__isnull=False
+    ).annotate(search_rank=-F('search__rank'))
+
+
+SEARCH_BACKENDS = {
+    'postgresql': postgres_search,
+    'sqlite': sqlite_search,
+}
+
+
+def search_recipes(queryset, query):
+    # Ранжируется уже отфильтрованная выборка, поэтому поиск сочетается
+    # с остальными фильтрами, а число строк ограничивает пагинация.
+    search = SEARCH_BACKENDS.get(connections[queryset.db].vendor)
+    if search is None:
+        return queryset.filter(
+            Q(name__icontains=query) | Q(text__icontains=query)
+        )
+    return search(queryset, query).order_by('-search_rank', '-pub_date')
@@ -0,0 +1,75 @@
+from django.db.models import Case, F, Sum, Value, When
+
+from recipes.models import RecipeIngredients, ShoppingListItem
+
+
+def recipe_amounts(recipe_id):
+    return dict(
+        RecipeIngredients.objects.filter(recipe_id=recipe_id).values_list(
+            'ingredient_id', 'amount'
+        )
+    )
+
+
+def apply_deltas(user_ids, deltas):
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    if not user_ids or not deltas:
+        return
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id, amount=0
+            )
+            for user_id in user_ids
+            for ingredient_id, delta in deltas.items() if delta > 0
+        ),
+        ignore_conflicts=True
+    )
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=deltas
+    )
+    items.update(
+        amount=F('amount') + Case(
+            *(
+                When(ingredient_id=ingredient_id, then=Value(delta))
+                for ingredient_id, delta in deltas.items()
+            ),
+            default=Value(0)
+        )
+    )
+    items.filter(amount=0).delete()
+
+
+def live_totals(user_ids):
+    return {
+        (row['recipe__recipes_shoppingcart__user_id'],
+         row['ingredient_id']): row['total']
+        for row in RecipeIngredients.objects.filter(
+            recipe__recipes_shoppingcart__user_id__in=user_ids
+        ).values(
+            'recipe__recipes_shoppingcart__user_id', 'ingredient_id'
+        ).annotate(total=Sum('amount')).order_by()
+    }
+
+
+def stored_totals(user_ids):
+    return {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount
+        in ShoppingListItem.objects.filter(user_id__in=user_ids).values_list(
+            'user_id', 'ingredient_id', 'amount'
+        )
+    }
+
+
+def rebuild(user_ids):
+    ShoppingListItem.objects.filter(user_id__in=user_ids).delete()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=user_id, ingredient_id=ingredient_id, amount=total
+        )
+        for (user_id, ingredient_id), total in live_totals(user_ids).items()
+    )
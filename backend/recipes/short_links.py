@@ -0,0 +1,44 @@
+from django.conf import settings
+
+from foodgram_backend.lru import MISSING, LRUCache
+from recipes.models import Recipe
+
+short_links = LRUCache(
+    'short_links',
+    settings.SHORT_LINK_CACHE_SIZE,
+    settings.SHORT_LINK_CACHE_TTL,
+    version_alias='shared'
+)
+
+
+def resolve_short_link(hash):
+    recipe_id = short_links.get(('hash', hash))
+    if recipe_id is MISSING:
+        recipe_id = Recipe.objects.filter(hash=hash).values_list(
+            'id', flat=True
+        ).first()
+        short_links.set(
+            ('hash', hash),
+            recipe_id,
+            None if recipe_id else settings.SHORT_LINK_CACHE_NEGATIVE_TTL
+        )
+    return recipe_id
+
+
+def get_short_link(recipe_id):
+    hash = short_links.get(('recipe', recipe_id))
+    if hash is MISSING:
+        hash = Recipe.objects.filter(pk=recipe_id).values_list(
+            'hash', flat=True
+        ).first()
+        short_links.set(
+            ('recipe', recipe_id),
+            hash,
+            None if hash else settings.SHORT_LINK_CACHE_NEGATIVE_TTL
+        )
+    return hash
+
+
+def forget_short_link(recipe):
+    short_links.delete(('hash', recipe.hash))
+    short_links.delete(('recipe', recipe.id))
@@ -0,0 +1,129 @@
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_migrate,
+                                      post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+
+from foodgram_backend.image_variants import is_new_upload, schedule_variants
+from foodgram_backend.response_cache import recipe_responses
+from recipes.ingredient_catalog import ingredient_catalog
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.search import restore_search_index
+from recipes.shopping_lists import apply_deltas, recipe_amounts
+from recipes.short_links import forget_short_link
+from recipes.tag_masks import forget_mask_bits, sync_tags_masks
+
+User = get_user_model()
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_image_uploaded(sender, instance, **kwargs):
+    instance.image_uploaded = is_new_upload(instance.image)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    if created:
+        forget_short_link(instance)
+        User.increment(instance.author_id, 'recipes_count')
+    if getattr(instance, 'image_uploaded', False):
+        schedule_variants(instance.image, 'recipe')
+    recipe_responses.bump()
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    forget_short_link(instance)
+    User.increment(instance.author_id, 'recipes_count', -1)
+    recipe_responses.bump()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance.cleared_recipe_ids = list(
+            instance.recipe_set.values_list('pk', flat=True)
+        )
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        sync_tags_masks((instance.pk,))
+    elif action == 'post_clear':
+        sync_tags_masks(instance.cleared_recipe_ids)
+    else:
+        sync_tags_masks(pk_set)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_saved(sender, instance, created, **kwargs):
+    if created:
+        apply_deltas(
+            (instance.user_id,), recipe_amounts(instance.recipe_id)
+        )
+        Recipe.increment(instance.recipe_id, 'cart_count')
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def shopping_cart_deleted(sender, instance, **kwargs):
+    Recipe.increment(instance.recipe_id, 'cart_count', -1)
+    apply_deltas(
+        (instance.user_id,),
+        {
+            ingredient_id: -amount
+            for ingredient_id, amount
+            in recipe_amounts(instance.recipe_id).items()
+        }
+    )
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_saved(sender, instance, created, **kwargs):
+    if created:
+        Recipe.increment(instance.recipe_id, 'favorites_count')
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    Recipe.increment(instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    ingredient_catalog.invalidate()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_recipes_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        Recipe.objects.filter(ingredients=instance).touch()
+    recipe_responses.bump()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_recipes_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        Recipe.objects.filter(tags=instance).touch()
+    recipe_responses.bump()
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    Recipe.objects.filter(tags=instance).update(
+        tags_mask=F('tags_mask').bitand(~instance.mask)
+    )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_bits_changed(sender, **kwargs):
+    forget_mask_bits()
+
+
+@receiver(post_migrate)
+def search_index_migrated(sender, using, **kwargs):
+    if sender.name == 'recipes':
+        restore_search_index(connections[using])
@@ -0,0 +1,71 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db.models import F
+
+from foodgram_backend.lru import MISSING, LRUCache
+from recipes.models import Recipe, Tag
+
+# При большем числе битов список подходящих масок слишком длинный.
+MASK_IN_MAX_BITS = 10
+# Число битов меняется только с тегами, срок жизни лишь страхует.
+MASK_BITS_TTL = 3600
+
+mask_bits_cache = LRUCache(
+    'tag_mask_bits', 1, MASK_BITS_TTL, version_alias='shared'
+)
+
+
+def tags_mask(tags):
+    return reduce(or_, (tag.mask for tag in tags), 0)
+
+
+def mask_bits():
+    bits = mask_bits_cache.get('bits')
+    if bits is MISSING:
+        bit = Tag.objects.order_by('-bit').values_list(
+            'bit', flat=True
+        ).first()
+        bits = 0 if bit is None else bit + 1
+        mask_bits_cache.set('bits', bits)
+    return bits
+
+
+def forget_mask_bits():
+    mask_bits_cache.delete('bits')
+
+
+def filter_by_tags(queryset, tags):
+    mask = tags_mask(tags)
+    bits = mask_bits()
+    if bits > MASK_IN_MAX_BITS:
+        return queryset.alias(
+            matched_tags=F('tags_mask').bitand(mask)
+        ).exclude(matched_tags=0)
+    return queryset.filter(tags_mask__in=[
+        candidate for candidate in range(1 << bits) if candidate & mask
+    ])
+
+
+def sync_tags_masks(recipe_ids):
+    masks = dict.fromkeys(recipe_ids, 0)
+    if not masks:
+        return
+    for recipe_id, bit in Recipe.tags.through.objects.filter(
+        recipe_id__in=masks
+    ).values_list('recipe_id', 'tag__bit'):
+        masks[recipe_id] |= 1 << bit
+    recipes_by_mask = defaultdict(list)
+    for recipe_id, mask in masks.items():
+        recipes_by_mask[mask].append(recipe_id)
+    for mask, ids in recipes_by_mask.items():
+        Recipe.objects.filter(pk__in=ids).update(tags_mask=mask)
+
+
+def rebuild_tags_masks():
+    Recipe.objects.update(tags_mask=0)
+    for tag in Tag.objects.all():
+        Recipe.objects.filter(tags=tag).update(
+            tags_mask=F('tags_mask').bitor(tag.mask)
+        )
@@ -1,17 +1,32 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from foodgram_backend.paginators import EstimatedCountPaginator
+
 from .models import FoodgramUser, Subscription
 
 
 class FoodgramUserAdmin(UserAdmin):
-    search_fields = ('username', 'email')
+    list_display = UserAdmin.list_display + (
+        'recipes_count', 'followers_count'
+    )
+    search_fields = ('^username', '^email')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    readonly_fields = ('recipes_count', 'followers_count')
+    fieldsets = UserAdmin.fieldsets + (
+        ('Статистика', {'fields': ('recipes_count', 'followers_count')}),
+    )
 
 
 class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'subscription')
     list_display_links = ('user',)
-    search_fields = ('user',)
+    list_select_related = ('user', 'subscription')
+    search_fields = ('^user__username', '^subscription__username')
+    autocomplete_fields = ('user', 'subscription')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(FoodgramUser, FoodgramUserAdmin)
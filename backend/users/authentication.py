@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from foodgram_backend.lru import MISSING, LRUCache
+
+User = get_user_model()
+
+tokens = LRUCache(
+    'tokens', settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL,
+    version_alias='shared'
+)
+
+
+def snapshot(instance):
+    return tuple(zip(*(
+        (field.attname, getattr(instance, field.attname))
+        for field in instance._meta.concrete_fields
+    )))
+
+
+def forget_token(key):
+    tokens.delete(key)
+
+
+def forget_user_tokens(user_id):
+    key = tokens.get(('user', user_id))
+    if key is not MISSING:
+        tokens.delete(key)
+        tokens.delete(('user', user_id))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication с кэшем токенов в памяти процесса."""
+
+    def authenticate_credentials(self, key):
+        entry = tokens.get(key)
+        if entry is MISSING:
+            user, token = super().authenticate_credentials(key)
+            tokens.set(key, (user._state.db, snapshot(user), snapshot(token)))
+            tokens.set(('user', user.pk), key)
+            return user, token
+        db, user_fields, token_fields = entry
+        user = User.from_db(db, *user_fields)
+        token = Token.from_db(db, *token_fields)
+        token.user = user
+        return user, token
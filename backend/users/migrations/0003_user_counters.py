@@ -0,0 +1,55 @@
+# Generated by Django 3.2.3 on 2026-10-18 21:50
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def related_count(model, field):
+    return Coalesce(
+        models.Subquery(
+            model.objects.filter(**{field: models.OuterRef('pk')})
+            .order_by().values(field)
+            .annotate(total=models.Count('pk')).values('total')
+        ),
+        0
+    )
+
+
+def fill_counters(apps, schema_editor):
+    FoodgramUser = apps.get_model('users', 'FoodgramUser')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscription = apps.get_model('users', 'Subscription')
+    FoodgramUser.objects.update(
+        recipes_count=related_count(Recipe, 'author'),
+        followers_count=related_count(Subscription, 'subscription')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_counters'),
+        ('users', '0002_alter_subscription_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodgramuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                verbose_name='Подписчиков'
+            ),
+        ),
+        migrations.AddField(
+            model_name='foodgramuser',
+            name='recipes_count',
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                verbose_name='Рецептов'
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.3 on 2026-10-18 22:10
+
+from django.db import migrations
+
+FIELDS = ('username', 'email')
+
+
+def create_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in FIELDS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS users_foodgramuser_{field}_prefix '
+            f'ON users_foodgramuser (UPPER({field}) text_pattern_ops)'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in FIELDS:
+        schema_editor.execute(
+            f'DROP INDEX IF EXISTS users_foodgramuser_{field}_prefix'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
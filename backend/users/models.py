@@ -2,10 +2,11 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 from foodgram_backend import constants
+from foodgram_backend.counters import CountersMixin
 from users.validators import UsernameValidator
 
 
-class FoodgramUser(AbstractUser):
+class FoodgramUser(CountersMixin, AbstractUser):
     username = models.CharField(
         'Ник пользователя',
         max_length=constants.USER_TEXTFIELD_MAX_LENGTH,
@@ -32,9 +33,20 @@ class FoodgramUser(AbstractUser):
         null=True,
         default=None
     )
+    recipes_count = models.PositiveIntegerField(
+        'Рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        'Подписчиков',
+        default=0,
+        editable=False
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
+    counter_fields = ('recipes_count', 'followers_count')
 
     class Meta:
         verbose_name = 'Пользователь'
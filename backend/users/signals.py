@@ -0,0 +1,66 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from foodgram_backend.image_variants import is_new_upload, schedule_variants
+from foodgram_backend.response_cache import recipe_responses
+from recipes.models import Recipe
+from users.authentication import forget_token, forget_user_tokens
+from users.models import FoodgramUser, Subscription
+
+# Поля автора, которые попадают в ответы с рецептами.
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name', 'avatar')
+
+
+@receiver(pre_save, sender=FoodgramUser)
+def avatar_uploaded(sender, instance, **kwargs):
+    instance.avatar_uploaded = is_new_upload(instance.avatar)
+
+
+@receiver(pre_save, sender=FoodgramUser)
+def author_fields_changed(sender, instance, update_fields, **kwargs):
+    instance.author_changed = False
+    if instance.pk is None:
+        return
+    if update_fields is not None and not update_fields & set(AUTHOR_FIELDS):
+        return
+    saved = sender.objects.filter(pk=instance.pk).values_list(
+        *AUTHOR_FIELDS
+    ).first()
+    current = tuple(
+        str(getattr(instance, field) or '') for field in AUTHOR_FIELDS
+    )
+    instance.author_changed = saved is not None and tuple(
+        value or '' for value in saved
+    ) != current
+
+
+@receiver(post_save, sender=FoodgramUser)
+def user_saved(sender, instance, created, **kwargs):
+    forget_user_tokens(instance.pk)
+    if getattr(instance, 'avatar_uploaded', False):
+        schedule_variants(instance.avatar, 'avatar')
+    if not created and getattr(instance, 'author_changed', False):
+        Recipe.objects.filter(author=instance).touch()
+        recipe_responses.bump()
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_saved(sender, instance, created, **kwargs):
+    if created:
+        FoodgramUser.increment(instance.subscription_id, 'followers_count')
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    FoodgramUser.increment(instance.subscription_id, 'followers_count', -1)
+
+
+@receiver(post_delete, sender=FoodgramUser)
+def user_deleted(sender, instance, **kwargs):
+    forget_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    forget_token(instance.key)